@@ -0,0 +1,108 @@
+"""
+Async facade over database.py for use inside handlers.
+
+sqlite3 calls block, so every query is shipped to a single dedicated thread.
+One thread is enough: the connection is shared anyway, and it keeps writes
+serialized without holding up the polling loop.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+import database
+import metrics
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+DB_SECONDS = metrics.Histogram("bot_db_seconds", "Database calls, including the wait for the database thread", ("function",))
+
+async def run_sync(func, *args, **kwargs):
+    """Run a blocking database function on the database thread"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+def _async(func):
+    name = func.__name__
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await run_sync(func, *args, **kwargs)
+        finally:
+            DB_SECONDS.observe(time.perf_counter() - start, name)
+    return wrapper
+
+async def get_user(user_id):
+    # Cache hits are answered on the loop without a round-trip to the db thread
+    user = database.get_cached_user(user_id)
+    if user is database.NOT_CACHED:
+        with DB_SECONDS.time("load_user"):
+            user = await run_sync(database.load_user, user_id)
+    return user
+
+get_user_cache_stats = database.get_user_cache_stats
+
+metrics.Counter("bot_user_cache_lookups_total", "User row lookups by cache outcome", ("result",),
+                collect=lambda: {("hit",): get_user_cache_stats()["hits"], ("miss",): get_user_cache_stats()["misses"]})
+metrics.Gauge("bot_user_cache_size", "User rows held in memory",
+              collect=lambda: {(): get_user_cache_stats()["size"]})
+
+def shutdown():
+    _executor.shutdown(wait=True)
+    database.close_db()
+
+init_db = _async(database.init_db)
+add_user = _async(database.add_user)
+update_user_lang = _async(database.update_user_lang)
+update_user_name = _async(database.update_user_name)
+update_user_phone = _async(database.update_user_phone)
+is_user_registered = _async(database.is_user_registered)
+register_user_local = _async(database.register_user_local)
+reserve_seat = _async(database.reserve_seat)
+get_registrations_by_event = _async(database.get_registrations_by_event)
+get_registered_participant = _async(database.get_registered_participant)
+find_participant_by_phone = _async(database.find_participant_by_phone)
+get_checkin_roster = _async(database.get_checkin_roster)
+get_roster_version = _async(database.get_roster_version)
+mark_attended = _async(database.mark_attended)
+get_attendance_counts = _async(database.get_attendance_counts)
+enqueue_sheet_export = _async(database.enqueue_sheet_export)
+get_pending_sheet_exports = _async(database.get_pending_sheet_exports)
+delete_sheet_exports = _async(database.delete_sheet_exports)
+get_event_sheet_snapshot = _async(database.get_event_sheet_snapshot)
+delete_event_sheet_exports = _async(database.delete_event_sheet_exports)
+get_all_users = _async(database.get_all_users)
+mark_users_blocked = _async(database.mark_users_blocked)
+unblock_user = _async(database.unblock_user)
+create_broadcast_job = _async(database.create_broadcast_job)
+get_next_broadcast_job = _async(database.get_next_broadcast_job)
+get_broadcast_batch = _async(database.get_broadcast_batch)
+record_broadcast_delivery = _async(database.record_broadcast_delivery)
+start_broadcast_job = _async(database.start_broadcast_job)
+set_broadcast_job_cursor = _async(database.set_broadcast_job_cursor)
+finish_broadcast_job = _async(database.finish_broadcast_job)
+fail_broadcast_job = _async(database.fail_broadcast_job)
+request_sheet_sync = _async(database.request_sheet_sync)
+get_next_sheet_sync = _async(database.get_next_sheet_sync)
+set_sheet_sync_status = _async(database.set_sheet_sync_status)
+add_category = _async(database.add_category)
+get_categories = _async(database.get_categories)
+add_event = _async(database.add_event)
+add_event_with_broadcast = _async(database.add_event_with_broadcast)
+get_event_participants_count = _async(database.get_event_participants_count)
+get_events_by_category = _async(database.get_events_by_category)
+get_all_events = _async(database.get_all_events)
+get_events_after = _async(database.get_events_after)
+get_events_page = _async(database.get_events_page)
+get_event_by_id = _async(database.get_event_by_id)
+delete_event = _async(database.delete_event)
+update_event_field = _async(database.update_event_field)
+get_first_event_card = _async(database.get_first_event_card)
+get_adjacent_event_card = _async(database.get_adjacent_event_card)
+get_event_seats = _async(database.get_event_seats)
+repair_registered_counts = _async(database.repair_registered_counts)
+load_fsm_state = _async(database.load_fsm_state)
+save_fsm_states = _async(database.save_fsm_states)
+delete_stale_fsm_states = _async(database.delete_stale_fsm_states)
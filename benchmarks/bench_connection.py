@@ -0,0 +1,42 @@
+"""
+get_user and register_user_local: a connection per call (the old
+database.py) against the shared long-lived connection.
+"""
+import sqlite3
+
+from common import report, scratch_dir, timed
+
+USERS = 2000
+READS = 20000
+
+def main():
+    scratch_dir()
+    import database
+    from config import DATABASE_NAME
+
+    database.init_db()
+    for user_id in range(USERS):
+        database.add_user(user_id, f"User {user_id}", f"+99890{user_id:07d}", "ru")
+    database.add_event(1, None, "Benchmark", "10:00", "2030-01-01")
+
+    def old_get_user(i):
+        conn = sqlite3.connect(DATABASE_NAME)
+        conn.execute("SELECT * FROM users WHERE user_id = ?", (i % USERS,)).fetchone()
+        conn.close()
+
+    def old_register(i):
+        conn = sqlite3.connect(DATABASE_NAME)
+        conn.execute("INSERT OR IGNORE INTO registrations (user_id, event_id) VALUES (?, ?)", (i, 1))
+        conn.commit()
+        conn.close()
+
+    # load_user is the query behind get_user; get_user itself is served from the user cache
+    report("get_user, connection per call", READS, timed(old_get_user, READS))
+    report("get_user, shared connection", READS, timed(lambda i: database.load_user(i % USERS), READS))
+    report("register_user_local, connection per call", USERS, timed(old_register, USERS))
+    report("register_user_local, shared connection", USERS,
+           timed(lambda i: database.register_user_local(USERS + i, 1), USERS))
+    database.close_db()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+show_events for a category with 200 events and 50k registrations.
+
+The old handler listed the category's events, then ran one COUNT(*) per
+event (N+1). Today the counts come from the trigger-maintained
+registered_count column, and show_events reads a single card; flipping
+through the carousel reads one card per tap.
+"""
+import time
+
+from common import scratch_dir
+
+EVENTS = 200
+REGISTRATIONS = 50000
+ROUNDS = 50
+
+def main():
+    scratch_dir()
+    import database
+
+    database.init_db()
+    database.add_category("Online")
+    with database.get_cursor(commit=True) as cursor:
+        cursor.executemany(
+            "INSERT INTO events (category_id, description, time_info, event_date, max_participants) VALUES (1, ?, '10:00', '2030-01-01', 0)",
+            [(f"Event {i}",) for i in range(EVENTS)])
+        cursor.executemany("INSERT INTO registrations (user_id, event_id) VALUES (?, ?)",
+                           [(i, 1 + i % EVENTS) for i in range(REGISTRATIONS)])
+
+    def old_feed():
+        with database.get_cursor() as cursor:
+            cursor.execute('''
+                SELECT e.id, e.image_id, e.description, e.time_info, e.event_date, e.max_participants
+                FROM events e JOIN categories c ON e.category_id = c.id
+                WHERE c.name = ?
+            ''', ("Online",))
+            events = cursor.fetchall()
+            for event in events:
+                cursor.execute("SELECT COUNT(*) FROM registrations WHERE event_id = ?", (event[0],))
+                cursor.fetchone()
+
+    def first_card():
+        database.get_first_event_card("Online")
+
+    def all_cards():
+        card = database.get_first_event_card("Online")
+        while card is not None:
+            card = database.get_adjacent_event_card(card[0])
+
+    for label, func in (("old: event list + COUNT(*) per event", old_feed),
+                        ("now: first card (what show_events runs)", first_card),
+                        ("now: flipping through all 200 cards", all_cards)):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            func()
+        print(f"{label:<44} {(time.perf_counter() - start) / ROUNDS * 1000:>8.2f} ms")
+    database.close_db()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Registration lookups on 1M registrations, with and without the indexes
+added by migration 1. Prints the query plan and the average time of each
+query.
+"""
+import time
+
+from common import scratch_dir
+
+REGISTRATIONS = 1_000_000
+EVENTS = 1000
+ROUNDS = 20
+
+QUERIES = {
+    "is_user_registered": ("SELECT id FROM registrations WHERE user_id = ? AND event_id = ?", (123457, 457)),
+    "participants count": ("SELECT COUNT(*) FROM registrations WHERE event_id = ?", (457,)),
+    "get_registrations_by_event": ("SELECT user_id FROM registrations WHERE event_id = ?", (457,)),
+}
+
+def measure(conn, label):
+    print(label)
+    for name, (sql, params) in QUERIES.items():
+        plan = "; ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            conn.execute(sql, params).fetchall()
+        elapsed = (time.perf_counter() - start) / ROUNDS * 1000
+        print(f"  {name:<28} {elapsed:>9.3f} ms  {plan}")
+
+def main():
+    scratch_dir()
+    import database
+
+    database.init_db()
+    conn = database.get_connection()
+    with database.get_cursor(commit=True) as cursor:
+        cursor.executemany("INSERT INTO events (category_id, description) VALUES (1, ?)",
+                           [(f"Event {i}",) for i in range(EVENTS)])
+        cursor.executemany("INSERT INTO registrations (user_id, event_id) VALUES (?, ?)",
+                           ((i, 1 + i % EVENTS) for i in range(REGISTRATIONS)))
+    conn.execute("ANALYZE")
+
+    measure(conn, f"with indexes ({REGISTRATIONS:,} registrations)")
+    conn.execute("DROP INDEX idx_registrations_user_event")
+    conn.execute("DROP INDEX idx_registrations_event")
+    # Reconnect so no statement prepared against the indexes is reused
+    database.close_db()
+    conn = database.get_connection()
+    measure(conn, "without indexes (before migration 1)")
+    database.close_db()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Rendering a reply: its text and keyboard, with and without the keyboard cache.
+
+"uncached" calls the undecorated builders (`__wrapped__`), which is what
+every message did before; "cached" calls the public getters. The
+"+ serialize" rows also dump the markup to JSON, as the Bot API session
+does for every sent message, to show how much of a whole send the cache
+saves.
+"""
+from common import report, timed
+
+COUNT = 100000
+LANGS = ("ru", "uz", "en")
+
+def main():
+    import keyboards as kb
+    from i18n import t
+
+    kb.warm_up()
+
+    def main_menu(getter):
+        def render(i):
+            lang = LANGS[i % 3]
+            return t(lang, "main_menu"), getter(lang)
+        return render
+
+    def event_card(getter):
+        def render(i):
+            # 50 events, flipping back and forth through the carousel
+            return t(LANGS[i % 3], "main_menu"), getter(LANGS[i % 3], i % 50, True, True)
+        return render
+
+    def serialized(render):
+        def send(i):
+            text, markup = render(i)
+            return text, markup.model_dump_json(exclude_none=True)
+        return send
+
+    cases = (
+        ("main menu", main_menu(kb.get_main_menu.__wrapped__), main_menu(kb.get_main_menu)),
+        ("event card", event_card(kb.get_event_card_keyboard.__wrapped__), event_card(kb.get_event_card_keyboard)),
+    )
+    for name, uncached, cached in cases:
+        report(f"{name}: uncached", COUNT, timed(uncached, COUNT))
+        report(f"{name}: cached", COUNT, timed(cached, COUNT))
+        report(f"{name}: uncached + serialize", COUNT, timed(serialized(uncached), COUNT))
+        report(f"{name}: cached + serialize", COUNT, timed(serialized(cached), COUNT))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Shared setup for the benchmark scripts.
+
+Run a benchmark from the repository root, e.g.
+`python benchmarks/bench_connection.py`. Each one works on a scratch
+database in a fresh temporary directory and never touches
+bot_database.db.
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("SHEETS_BACKEND", "fake")
+
+def scratch_dir():
+    """chdir into a new temporary directory, so DATABASE_NAME is a scratch file"""
+    path = tempfile.mkdtemp(prefix="avlod-bench-")
+    os.chdir(path)
+    return path
+
+def timed(func, count):
+    """Seconds taken by `count` calls of func(i)"""
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return time.perf_counter() - start
+
+def report(label, count, seconds):
+    print(f"{label:<44} {count / seconds:>12,.0f} ops/s")
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
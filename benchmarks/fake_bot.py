@@ -0,0 +1,66 @@
+"""
+A Bot whose API calls are answered locally, and synthetic updates, for
+feeding the real dispatcher without Telegram.
+"""
+import asyncio
+import datetime
+import itertools
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, GetUpdates, SendMessage, SendPhoto
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+_ids = itertools.count(1)
+
+class FakeSession(BaseSession):
+    """
+    Answers every Bot API call instantly. getUpdates hands out `pending` in
+    batches of 100, after `latency` seconds.
+    """
+
+    def __init__(self, pending=(), latency=0.0):
+        super().__init__()
+        self.pending = list(pending)
+        self.latency = latency
+        self.calls = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls += 1
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="bot", username="bot")
+        if isinstance(method, GetUpdates):
+            await asyncio.sleep(self.latency)
+            batch, self.pending = self.pending[:100], self.pending[100:]
+            if not batch:
+                await asyncio.sleep(0.01)  # a long poll with nothing to deliver
+            return batch
+        if isinstance(method, (SendMessage, SendPhoto)):
+            return Message(message_id=next(_ids), date=datetime.datetime.now(),
+                           chat=Chat(id=method.chat_id, type="private"), text=getattr(method, "text", None))
+        return True
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+def create_bot(session=None):
+    return Bot(token="123456:BENCHMARK", session=session or FakeSession())
+
+def _user(user_id):
+    return User(id=user_id, is_bot=False, first_name=f"u{user_id}")
+
+def text_update(user_id, text):
+    message = Message(message_id=next(_ids), date=datetime.datetime.now(),
+                      chat=Chat(id=user_id, type="private"), from_user=_user(user_id), text=text)
+    return Update(update_id=next(_ids), message=message)
+
+def callback_update(user_id, data):
+    message = Message(message_id=next(_ids), date=datetime.datetime.now(),
+                      chat=Chat(id=user_id, type="private"), from_user=User(id=1, is_bot=True, first_name="bot"),
+                      text="card")
+    callback = CallbackQuery(id=str(next(_ids)), from_user=_user(user_id), chat_instance="1",
+                             message=message, data=data)
+    return Update(update_id=next(_ids), callback_query=callback)
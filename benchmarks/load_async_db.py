@@ -0,0 +1,78 @@
+"""
+500 concurrent simulated users, each pressing "Online Events" and then
+confirming a registration. Every update goes through the real dispatcher
+(middlewares, filters, handlers) with a fake Bot API session, so the
+latency is that of a whole handler. Reports p50/p99 per update and the
+longest stall of the event loop. Queries run on the database thread, so
+the stalls left are aiogram's own parsing and dispatch of 500 updates
+that all arrive in the same instant.
+"""
+import asyncio
+import time
+
+from common import percentile, scratch_dir
+import fake_bot
+
+USERS = 500
+EVENTS = 50
+
+async def user_session(dp, bot, label, user_id):
+    """Latency of each of the user's two updates"""
+    latencies = []
+    for update in (fake_bot.text_update(user_id, label),
+                   fake_bot.callback_update(user_id, f"confirm_reg_{1 + user_id % EVENTS}")):
+        start = time.perf_counter()
+        await dp.feed_update(bot, update)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+async def watch_loop(stop, lags):
+    """Longest delay of a 1 ms sleep while the handlers run"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+async def main():
+    scratch_dir()
+    import async_database as ad
+    import database
+    import keyboards as kb
+    from i18n import t
+    from main import create_dispatcher
+
+    await ad.init_db()
+    kb.warm_up()
+    for user_id in range(1, USERS + 1):
+        await ad.add_user(user_id, f"User {user_id}", f"+99890{user_id:07d}", "ru")
+    await ad.add_category("Online")
+    for i in range(EVENTS):
+        await ad.add_event(1, None, f"Event {i}", "10:00", "2030-01-01", 100)
+    database.user_cache.clear()
+
+    # Two updates per user within milliseconds would trip the flood control
+    dp = create_dispatcher(throttle=False)
+    bot = fake_bot.create_bot()
+    label = t("ru", "online_events")
+
+    stop, lags = asyncio.Event(), []
+    watcher = asyncio.create_task(watch_loop(stop, lags))
+    start = time.perf_counter()
+    sessions = await asyncio.gather(*(user_session(dp, bot, label, user_id)
+                                      for user_id in range(1, USERS + 1)))
+    total = time.perf_counter() - start
+    stop.set()
+    await watcher
+    await dp.storage.close()
+    ad.shutdown()
+
+    latencies = [latency for session in sessions for latency in session]
+    registered = database.get_connection().execute("SELECT COUNT(*) FROM registrations").fetchone()[0]
+    print(f"{len(latencies)} updates from {USERS} concurrent users in {total * 1000:.0f} ms "
+          f"({registered} registrations)")
+    print(f"handler latency p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    print(f"longest event loop stall {max(lags) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
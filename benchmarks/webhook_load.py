@@ -0,0 +1,129 @@
+"""
+Updates per second through the webhook server versus long polling.
+
+Both phases feed the same synthetic /start updates from USERS registered
+users through the real dispatcher (create_dispatcher, with the flood
+control off since every user sends many updates within seconds) and a
+fake Bot API session that answers every call instantly (fake_bot.py).
+The webhook phase POSTs them to a local webhook.create_app server,
+WEBHOOK_CONNECTIONS at a time like Telegram's max_connections. The
+polling phase hands them out in getUpdates batches of 100, optionally
+after GET_UPDATES_LATENCY seconds to model the round trip to Telegram.
+Neither counts real Bot API latency for the replies.
+
+Each phase runs in its own process with a fresh dispatcher and database:
+routers attach to one dispatcher per process, and no state carries over.
+Throughput counts updates that reached the end of the middleware chain.
+"""
+import asyncio
+import multiprocessing
+import time
+
+from common import scratch_dir
+import fake_bot
+
+UPDATES = 5000
+USERS = 500
+WEBHOOK_CONNECTIONS = 40
+GET_UPDATES_LATENCY = 0.0
+TIMEOUT = 300  # seconds a phase may take before it is reported as stuck
+PORT = 8089
+SECRET = "benchmark-secret"
+
+class HandledCounter:
+    """Outer update middleware that sets `done` once `expected` updates were handled"""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.handled = 0
+        self.done = asyncio.Event()
+
+    async def __call__(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        finally:
+            self.handled += 1
+            if self.handled >= self.expected:
+                self.done.set()
+
+async def _setup():
+    scratch_dir()
+    import async_database
+    import keyboards as kb
+    from main import create_dispatcher
+
+    await async_database.init_db()
+    kb.warm_up()
+    for user_id in range(1, USERS + 1):
+        await async_database.add_user(user_id, f"u{user_id}", f"+99890{user_id:07d}", "ru")
+    dp = create_dispatcher(throttle=False)
+    counter = HandledCounter(UPDATES)
+    dp.update.outer_middleware(counter)
+    updates = [fake_bot.text_update(1 + i % USERS, "/start") for i in range(UPDATES)]
+    return dp, counter, updates
+
+async def _webhook_phase():
+    import aiohttp
+    import webhook
+
+    dp, counter, updates = await _setup()
+    bodies = [update.model_dump_json(exclude_none=True) for update in updates]
+    app = webhook.create_app(dp, fake_bot.create_bot(), secret=SECRET)
+    stop = asyncio.Event()
+    server = asyncio.create_task(webhook.serve(app, "127.0.0.1", PORT, stop))
+    await asyncio.sleep(0.3)
+    url = f"http://127.0.0.1:{PORT}{webhook.WEBHOOK_PATH}"
+    headers = {"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": SECRET}
+    connections = asyncio.Semaphore(WEBHOOK_CONNECTIONS)
+    try:
+        async with aiohttp.ClientSession() as http:
+            async def post(body):
+                async with connections:
+                    async with http.post(url, data=body, headers=headers) as response:
+                        assert response.status == 200, response.status
+
+            start = time.perf_counter()
+            await asyncio.wait_for(asyncio.gather(*(post(body) for body in bodies)), TIMEOUT)
+            await asyncio.wait_for(counter.done.wait(), TIMEOUT)
+            return time.perf_counter() - start, counter.handled
+    finally:
+        stop.set()
+        await server
+
+async def _polling_phase():
+    dp, counter, updates = await _setup()
+    bot = fake_bot.create_bot(fake_bot.FakeSession(updates, latency=GET_UPDATES_LATENCY))
+    start = time.perf_counter()
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False))
+    try:
+        await asyncio.wait_for(counter.done.wait(), TIMEOUT)
+        return time.perf_counter() - start, counter.handled
+    finally:
+        await dp.stop_polling()
+        await polling
+
+def run_phase(name):
+    """Entry point of a phase's process"""
+    import logging
+    import async_database
+    logging.basicConfig(level=logging.WARNING)
+    phase = _webhook_phase if name == "webhook" else _polling_phase
+    try:
+        seconds, handled = asyncio.run(phase())
+    except asyncio.TimeoutError:
+        print(f"{name}: not all {UPDATES} updates were handled within {TIMEOUT} s")
+        return
+    finally:
+        async_database.shutdown()
+    extra = f" (getUpdates latency {GET_UPDATES_LATENCY * 1000:.0f} ms)" if name == "polling" else ""
+    print(f"{name}: {handled} updates in {seconds:.2f} s -> {handled / seconds:,.0f} upd/s{extra}")
+
+def main():
+    context = multiprocessing.get_context("spawn")
+    for name in ("webhook", "polling"):
+        process = context.Process(target=run_phase, args=(name,))
+        process.start()
+        process.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+
+from aiogram.exceptions import (TelegramBadRequest, TelegramForbiddenError,
+                                TelegramNetworkError, TelegramRetryAfter,
+                                TelegramServerError)
+
+from async_database import (add_event_with_broadcast, create_broadcast_job, fail_broadcast_job, finish_broadcast_job, get_broadcast_batch,
+                            get_next_broadcast_job, mark_users_blocked, record_broadcast_delivery,
+                            set_broadcast_job_cursor, start_broadcast_job)
+from rate_limit import TokenBucket
+import metrics
+from i18n import t
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows ~30 messages per second in bulk and ~1 per second per chat
+GLOBAL_RATE = 30
+PER_CHAT_INTERVAL = 1.0
+MAX_CONCURRENCY = 10
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL = 5  # seconds between progress updates to the admin
+BATCH_SIZE = 200  # recipients loaded from the outbox at a time
+RETRY_DELAY = 30
+MAX_JOB_ATTEMPTS = 5  # failed runs of one job before it is given up
+POLL_INTERVAL = 5  # seconds between outbox checks while idle
+
+SENT, BLOCKED, FAILED = "sent", "blocked", "failed"
+
+DELIVERIES = metrics.Counter("bot_broadcast_deliveries_total", "Broadcast messages by result", ("result",))
+FLOOD_WAITS = metrics.Counter("bot_broadcast_flood_waits_total", "Flood-control pauses during broadcasts")
+
+# Set when a new job is queued so the idle worker picks it up immediately
+_wakeup = asyncio.Event()
+
+class Broadcaster:
+    """Sends messages to many chats within Telegram's rate limits"""
+
+    def __init__(self, bot, rate=GLOBAL_RATE, concurrency=MAX_CONCURRENCY):
+        self.bot = bot
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self._last_sent = {}
+        self._resume_at = 0.0
+
+    async def _wait_turn(self, chat_id):
+        # Flood control applies to the whole bot, so every sender waits it out
+        delay = self._resume_at - time.monotonic()
+        last = self._last_sent.get(chat_id)
+        if last is not None:
+            delay = max(delay, last + PER_CHAT_INTERVAL - time.monotonic())
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.bucket.acquire()
+        self._last_sent[chat_id] = time.monotonic()
+
+    async def send(self, chat_id, text):
+        """
+        Deliver one message. Flood waits are sat out and retried without
+        using up an attempt; transient errors get MAX_ATTEMPTS attempts.
+        """
+        attempt = 0
+        while True:
+            await self._wait_turn(chat_id)
+            try:
+                await self.bot.send_message(chat_id, text)
+                return SENT
+            except TelegramRetryAfter as e:
+                logger.warning("Flood control hit, pausing broadcast for %s s", e.retry_after)
+                # _wait_turn sleeps until then, for every sender
+                self._resume_at = max(self._resume_at, time.monotonic() + e.retry_after)
+                FLOOD_WAITS.inc()
+            except TelegramForbiddenError:
+                return BLOCKED
+            except TelegramBadRequest as e:
+                if "chat not found" in str(e).lower():
+                    return BLOCKED
+                logger.warning("Broadcast to %s failed: %s", chat_id, e)
+                return FAILED
+            except (TelegramNetworkError, TelegramServerError) as e:
+                attempt += 1
+                logger.warning("Broadcast to %s failed (attempt %s): %s", chat_id, attempt, e)
+                if attempt >= MAX_ATTEMPTS:
+                    return FAILED
+                await asyncio.sleep(2 ** attempt)
+
+    async def run(self, recipients, render, on_result=None):
+        """
+        recipients: list of (user_id, language)
+        render: callable returning the message text for a language
+        on_result: optional coroutine function called with (user_id, result)
+        """
+        stats = {"sent": 0, "blocked": 0, "failed": 0, "blocked_ids": []}
+        queue = iter(recipients)
+
+        async def worker():
+            for user_id, lang in queue:
+                result = await self.send(user_id, render(lang))
+                stats[result] += 1
+                DELIVERIES.inc(result)
+                if result == BLOCKED:
+                    stats["blocked_ids"].append(user_id)
+                if on_result:
+                    await on_result(user_id, result)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return stats
+
+def render_string(key):
+    return lambda lang: t(lang, key)
+
+async def enqueue_broadcast(admin_chat_id, admin_lang, key):
+    """Queue the `key` text for every user; the worker reports back to the admin"""
+    job_id = await create_broadcast_job(key, admin_chat_id, admin_lang)
+    _wakeup.set()
+    return job_id
+
+async def add_event_and_announce(admin_chat_id, admin_lang, key, *event):
+    """Create the event (add_event's arguments) with its `key` announcement queued in the same transaction"""
+    event_id, _ = await add_event_with_broadcast(key, admin_chat_id, admin_lang, *event)
+    _wakeup.set()
+    return event_id
+
+def start_worker(bot):
+    return asyncio.create_task(run_worker(bot))
+
+async def run_worker(bot):
+    """Drain the broadcast outbox forever; resumes interrupted jobs on startup"""
+    failures = {}  # job_id -> failed runs since this worker started
+    while True:
+        job = await get_next_broadcast_job()
+        if job is None:
+            # Jobs queued by other worker processes only show up in the database
+            try:
+                await asyncio.wait_for(_wakeup.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+        try:
+            await _process_job(bot, job)
+        except Exception:
+            failures[job[0]] = failures.get(job[0], 0) + 1
+            if failures[job[0]] >= MAX_JOB_ATTEMPTS:
+                # Later jobs in the outbox would wait behind this one forever
+                logger.exception("Broadcast job %s failed %s times, giving up", job[0], failures[job[0]])
+                await fail_broadcast_job(job[0])
+                continue
+            logger.exception("Broadcast job %s failed, retrying later", job[0])
+            await asyncio.sleep(RETRY_DELAY)
+
+async def _notify_admin(bot, chat_id, text, message_id=None):
+    """
+    Send (or edit) a status message to the admin who started the job.
+    Best effort: an admin who blocked the bot must not stall the
+    broadcast. Returns the sent message or None.
+    """
+    try:
+        if message_id is not None:
+            return await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+        return await bot.send_message(chat_id, text)
+    except (TelegramForbiddenError, TelegramBadRequest) as e:
+        # Blocked, chat gone, or the progress message is unchanged or deleted
+        logger.info("Broadcast status for admin %s not delivered: %s", chat_id, e)
+        return None
+
+async def _process_job(bot, job):
+    job_id, key, admin_chat_id, admin_lang, status, cursor, total, status_message_id, done = job
+
+    if status == "pending":
+        message = await _notify_admin(bot, admin_chat_id, t(admin_lang, "broadcast_started", total=total))
+        status_message_id = message.message_id if message else None
+        await start_broadcast_job(job_id, status_message_id)
+
+    broadcaster = Broadcaster(bot)
+    render = render_string(key)
+    last_report = time.monotonic()
+
+    async def record(user_id, result):
+        await record_broadcast_delivery(job_id, user_id, result)
+
+    while True:
+        batch = await get_broadcast_batch(job_id, cursor, BATCH_SIZE)
+        if not batch:
+            break
+        stats = await broadcaster.run(batch, render, on_result=record)
+        if stats["blocked_ids"]:
+            await mark_users_blocked(stats["blocked_ids"])
+        cursor = batch[-1][0]
+        await set_broadcast_job_cursor(job_id, cursor)
+
+        done += len(batch)
+        if status_message_id is not None and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            await _notify_admin(bot, admin_chat_id, t(admin_lang, "broadcast_progress", done=done, total=total),
+                                status_message_id)
+
+    counts = await finish_broadcast_job(job_id)
+    await _notify_admin(bot, admin_chat_id, t(admin_lang, "broadcast_done",
+        sent=counts.get(SENT, 0), blocked=counts.get(BLOCKED, 0), failed=counts.get(FAILED, 0)))
@@ -0,0 +1,131 @@
+"""
+Door check-in for moderators.
+
+Selecting an event loads its roster once into an in-memory index of
+normalized phones, so each phone a moderator sends is a dict lookup and the
+whole message is checked in with one write, however many phones it holds.
+Registrations made after the index was built fall back to the indexed
+database lookup and are added to the index. Renamed or re-numbered
+participants, cancelled registrations and deleted events bump the
+database's roster version (see migrations.py), and every index built
+before the bump is dropped, in whichever process it lives. Signed ticket
+codes (see tickets.py) can be mixed in with the phones. attended_at in the
+database stays the source of truth, so several moderators can work the
+same door.
+"""
+import re
+
+import tickets
+from async_database import (find_participant_by_phone, get_checkin_roster,
+                            get_registered_participant, get_roster_version,
+                            mark_attended)
+from database import MIN_PHONE_SUFFIX
+from phones import normalize_phone
+
+CHECKED_IN = "checked_in"
+ALREADY_CHECKED_IN = "already_checked_in"
+NOT_FOUND = "not_found"
+INVALID_TICKET = "invalid_ticket"
+WRONG_EVENT = "wrong_event"
+
+class EventIndex:
+    def __init__(self, roster):
+        self.by_phone = {}  # normalized phone -> (user_id, full_name, phone)
+        self.by_suffix = {}  # last MIN_PHONE_SUFFIX digits -> [normalized phones]
+        self.by_user = {}  # user_id -> (user_id, full_name, phone)
+        for user_id, full_name, phone, normalized in roster:
+            self.add(user_id, full_name, phone, normalized)
+
+    def add(self, user_id, full_name, phone, normalized=None):
+        normalized = normalized or normalize_phone(phone)
+        if normalized not in self.by_phone:
+            self.by_suffix.setdefault(normalized[-MIN_PHONE_SUFFIX:], []).append(normalized)
+        self.by_phone[normalized] = self.by_user[user_id] = (user_id, full_name, phone)
+
+    def find(self, digits):
+        """Same rules as database.find_participant_by_phone"""
+        if digits in self.by_phone:
+            return self.by_phone[digits]
+        if len(digits) >= MIN_PHONE_SUFFIX:
+            for normalized in self.by_suffix.get(digits[-MIN_PHONE_SUFFIX:], ()):
+                if normalized.endswith(digits):
+                    return self.by_phone[normalized]
+        return None
+
+_indexes = {}  # event_id -> EventIndex
+_version = None  # roster version the indexes were built from
+
+async def _check_version():
+    global _version
+    version = await get_roster_version()
+    if version != _version:
+        _indexes.clear()
+        _version = version
+
+async def warm(event_id):
+    """(Re)build the event's index; called when a moderator picks the event"""
+    # Read the version first: a change made while the roster loads triggers a rebuild later
+    await _check_version()
+    _indexes[event_id] = EventIndex(await get_checkin_roster(event_id))
+
+def split_phones(text):
+    """Phones or ticket codes in a moderator message: one per line, or separated by commas or semicolons"""
+    return [part.strip() for part in re.split(r"[\n,;]+", text or "") if part.strip()]
+
+async def _find_by_ticket(index, event_id, code):
+    """(participant, status if there is no participant)"""
+    ticket = tickets.verify(code)
+    if ticket is None:
+        return None, INVALID_TICKET
+    if ticket[0] != event_id:
+        return None, WRONG_EVENT
+    participant = index.by_user.get(ticket[1])
+    if participant is None:
+        participant = await get_registered_participant(event_id, ticket[1])
+        if participant:
+            index.add(*participant)
+    return participant, NOT_FOUND
+
+async def _find_by_phone(index, event_id, phone):
+    digits = normalize_phone(phone)
+    participant = index.find(digits) if digits else None
+    if participant is None and digits:
+        participant = await find_participant_by_phone(event_id, phone)
+        if participant:
+            index.add(*participant)
+    return participant, NOT_FOUND
+
+async def check_in(event_id, text):
+    """
+    Check in every phone or ticket code in the message. Returns
+    (input, status, participant) per entry in input order; participant is
+    (user_id, full_name, phone) or None.
+    """
+    await _check_version()
+    if event_id not in _indexes:
+        await warm(event_id)
+    index = _indexes[event_id]
+
+    matches = []
+    for raw in split_phones(text):
+        if tickets.is_ticket_code(raw):
+            participant, missing = await _find_by_ticket(index, event_id, raw)
+        else:
+            participant, missing = await _find_by_phone(index, event_id, raw)
+        matches.append((raw, participant, missing))
+
+    user_ids = list(dict.fromkeys(p[0] for _, p, _ in matches if p))
+    new = set(await mark_attended(event_id, user_ids)) if user_ids else set()
+
+    results = []
+    for raw, participant, missing in matches:
+        if participant is None:
+            status = missing
+        elif participant[0] in new:
+            # A phone repeated in the same message counts once
+            new.discard(participant[0])
+            status = CHECKED_IN
+        else:
+            status = ALREADY_CHECKED_IN
+        results.append((raw, status, participant))
+    return results
@@ -0,0 +1,191 @@
+"""
+Multi-process webhook runtime (BOT_MODE=webhook with BOT_WORKERS > 1).
+
+The main process owns the public webhook but runs no handlers. It checks
+the secret token and forwards each raw update to worker
+chat_id % BOT_WORKERS, a full bot process serving the same webhook
+endpoint on 127.0.0.1:WORKER_BASE_PORT + index. Dead workers are
+restarted.
+
+Every chat always lands on the same worker. The in-process caches (user
+rows, keyboards) therefore only ever see writes made for their own chats;
+check-in indexes, which hold other users' rows, follow the database's
+roster version instead. While one of a chat's updates is being forwarded, the
+front holds that chat's lock. So a chat's updates are handled one at a
+time, in arrival order, and different chats run in parallel across cores.
+
+Each process serves its own metrics: the front on METRICS_PORT and
+worker N on METRICS_PORT + 1 + N.
+
+Workers share the SQLite file (WAL, busy timeout, IMMEDIATE write
+transactions) and FSM_STORAGE. The background jobs (broadcast delivery,
+the Sheets export and full Sheets syncs) run in worker 0 only. They poll the database, so
+they also pick up jobs queued on other workers.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing
+import time
+from contextlib import asynccontextmanager
+
+from aiohttp import ClientConnectorError, ClientError, ClientSession, ClientTimeout, web
+
+from config import BOT_WORKERS, METRICS_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WORKER_BASE_PORT
+import metrics
+import webhook
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+WORKER_HOST = "127.0.0.1"
+FORWARD_TIMEOUT = 60  # seconds a worker may spend on one update
+CONNECT_RETRIES = 20  # while a worker is (re)starting
+RETRY_DELAY = 0.5
+SUPERVISE_INTERVAL = 1
+
+FORWARD_SECONDS = metrics.Histogram("bot_forward_seconds", "Updates forwarded to a worker, by worker and response status",
+                                    ("worker", "status"))
+
+def partition_key(update):
+    """Chat id of a raw update, or the sender's id when it has no chat; 0 if neither"""
+    for payload in update.values():
+        if not isinstance(payload, dict):
+            continue  # update_id
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        sender = payload.get("from") or payload.get("user")
+        if sender:
+            return sender["id"]
+    return 0
+
+class KeyedLock:
+    """One asyncio.Lock per key, dropped once nobody holds or waits for it"""
+
+    def __init__(self):
+        self._locks = {}  # key -> [lock, holders and waiters]
+
+    def __len__(self):
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+class Front:
+    """Receives Telegram's webhook and forwards every update to its chat's worker"""
+
+    def __init__(self, workers=BOT_WORKERS, secret=WEBHOOK_SECRET):
+        if not secret:
+            raise ValueError("The webhook needs a secret token (WEBHOOK_SECRET)")
+        self.urls = [f"http://{WORKER_HOST}:{WORKER_BASE_PORT + index}{WEBHOOK_PATH}" for index in range(workers)]
+        self.secret = secret
+        self.chats = KeyedLock()
+        self.session = None
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_get("/health", webhook.health)
+        app.router.add_post(WEBHOOK_PATH, self.handle)
+        app.on_startup.append(self._open)
+        app.on_cleanup.append(self._close)
+        return app
+
+    async def _open(self, app):
+        self.session = ClientSession(timeout=ClientTimeout(total=FORWARD_TIMEOUT))
+
+    async def _close(self, app):
+        await self.session.close()
+
+    async def handle(self, request):
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), self.secret.encode()):
+            return web.Response(status=401, text="Unauthorized")
+        body = await request.read()
+        try:
+            key = partition_key(json.loads(body))
+        except (ValueError, AttributeError, TypeError, KeyError):
+            return web.Response(status=400, text="Bad update")
+        worker = key % len(self.urls)
+        start = time.perf_counter()
+        async with self.chats.hold(key):
+            response = await self.forward(self.urls[worker], body)
+        FORWARD_SECONDS.observe(time.perf_counter() - start, str(worker), str(response.status))
+        return response
+
+    async def forward(self, url, body):
+        headers = {"Content-Type": "application/json", SECRET_HEADER: self.secret}
+        for _ in range(CONNECT_RETRIES):
+            try:
+                async with self.session.post(url, data=body, headers=headers) as response:
+                    # The worker may answer with a Bot API method call; pass it through as is
+                    return web.Response(status=response.status, body=await response.read(),
+                                        headers={"Content-Type": response.headers.get("Content-Type", "application/json")})
+            except ClientConnectorError:
+                await asyncio.sleep(RETRY_DELAY)
+            except (ClientError, asyncio.TimeoutError):
+                logger.exception("Forwarding an update to %s failed", url)
+                return web.Response(status=502)
+        # Telegram delivers the update again later
+        logger.error("Worker %s is not accepting updates", url)
+        return web.Response(status=503)
+
+def start_worker(target, index):
+    process = multiprocessing.get_context("spawn").Process(target=target, args=(index,), name=f"bot-worker-{index}")
+    process.start()
+    return process
+
+def stop_workers(processes):
+    # SIGTERM lets each worker finish its in-flight updates
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(webhook.SHUTDOWN_TIMEOUT + 5)
+        if process.is_alive():
+            process.kill()
+
+async def supervise(target, processes, stop):
+    """Restart workers that exit, until `stop` is set"""
+    while True:
+        await asyncio.sleep(SUPERVISE_INTERVAL)
+        if stop.is_set():
+            return
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                logger.error("Worker %s exited with code %s, restarting", index, process.exitcode)
+                processes[index] = start_worker(target, index)
+
+async def serve_worker(index, dp, bot):
+    """Worker side: the single-process webhook app, bound to the worker's local port"""
+    await webhook.serve(webhook.create_app(dp, bot), WORKER_HOST, WORKER_BASE_PORT + index)
+
+async def run_front(bot, allowed_updates, target):
+    """
+    Start BOT_WORKERS processes running `target(index)`, register the
+    webhook and forward updates until SIGINT/SIGTERM.
+    """
+    stop = webhook.stop_on_signals()
+    processes = [start_worker(target, index) for index in range(BOT_WORKERS)]
+    supervisor = asyncio.create_task(supervise(target, processes, stop))
+    metrics_server = await metrics.start_server(METRICS_PORT)
+    try:
+        await webhook.register(bot, allowed_updates)
+        await bot.session.close()
+        await webhook.serve(Front().create_app(), stop=stop)
+    finally:
+        supervisor.cancel()
+        if metrics_server:
+            await metrics_server.cleanup()
+        await asyncio.to_thread(stop_workers, processes)
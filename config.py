@@ -13,3 +13,54 @@ SOCIAL_LINKS = {
     "instagram": "https://www.instagram.com/avlodventures/",
     "telegram": "https://t.me/avlodventures",
     }
+
+# In-memory cache of user rows (language lookups on every update)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "600"))
+
+# Per-user flood control: THROTTLE_RATE updates per second with bursts of
+# THROTTLE_BURST; repeats of the same button press within
+# CALLBACK_DEDUP_WINDOW seconds are dropped. THROTTLE_MAX_USERS bounds the
+# number of users tracked (least recently active are forgotten first)
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "2"))
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "5"))
+CALLBACK_DEDUP_WINDOW = float(os.getenv("CALLBACK_DEDUP_WINDOW", "1.0"))
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", "10000"))
+
+# Google Sheets export: "google" uses service_account.json, "fake" keeps the
+# sheets in memory (local development without credentials)
+SHEETS_BACKEND = os.getenv("SHEETS_BACKEND", "google")
+
+# Key for signing ticket codes; derived from BOT_TOKEN when not set
+TICKET_SECRET = os.getenv("TICKET_SECRET")
+
+# How updates arrive: "polling" (getUpdates loop) or "webhook" (Telegram
+# POSTs them to WEBHOOK_URL + WEBHOOK_PATH; WEBHOOK_SECRET is required in
+# webhook mode and checked against the X-Telegram-Bot-Api-Secret-Token header)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Where FSM state (multi-step flows) lives: "sqlite" (the bot database),
+# "memory" (lost on restart) or "redis" (REDIS_URL; needs the redis package)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# sqlite: states not written for FSM_STATE_TTL seconds are dropped;
+# FSM_CACHE_SIZE states are kept in memory
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", "259200"))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+
+# Prometheus metrics at http://METRICS_HOST:METRICS_PORT/metrics (0 turns
+# the endpoint off). With BOT_WORKERS > 1 worker N uses METRICS_PORT + 1 + N
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+
+# Webhook mode only: number of worker processes. With more than one, the
+# main process receives the webhook and forwards each update to worker
+# chat_id % BOT_WORKERS, listening on 127.0.0.1:WORKER_BASE_PORT + index
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "8100"))
@@ -1,217 +1,617 @@
 import sqlite3
-from config import DATABASE_NAME
+import threading
+from contextlib import contextmanager
+from enum import Enum
+from cache import TTLCache
+import migrations
+from phones import normalize_phone
+from config import DATABASE_NAME, USER_CACHE_SIZE, USER_CACHE_TTL
+
+# One long-lived connection per process. Opening the file, parsing the schema
+# and setting up the journal on every helper call dominated the cost of the
+# small queries below, so every helper borrows this connection instead.
+_conn = None
+_lock = threading.RLock()
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA busy_timeout=5000",
+)
+
+def get_connection():
+    global _conn
+    with _lock:
+        if _conn is None:
+            # cached_statements keeps the prepared statements of all helpers alive
+            conn = sqlite3.connect(DATABASE_NAME, check_same_thread=False, cached_statements=256)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            _conn = conn
+        return _conn
+
+def close_db():
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+@contextmanager
+def transaction():
+    """
+    Write transaction that takes the database lock up front (BEGIN IMMEDIATE),
+    so read-then-write sequences inside it cannot interleave with other
+    writers, including other processes sharing the file.
+    """
+    with _lock:
+        conn = get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+# Almost every update starts with a user lookup just to read the language,
+# so user rows are served from memory. Unknown users are cached as None too;
+# every write to `users` below invalidates the entry.
+NOT_CACHED = object()
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+@contextmanager
+def get_cursor(commit=False):
+    """Borrow the shared connection; commits on success, rolls back on error"""
+    with _lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            if commit:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
 
 def init_db():
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        user_id INTEGER PRIMARY KEY,
-        full_name TEXT,
-        phone TEXT,
-        language TEXT
-    )
-    ''')
-    
-    # Categories table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS categories (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT UNIQUE
-    )
-    ''')
-    
-    # Pre-populate default categories if not exist
-    cursor.execute("INSERT OR IGNORE INTO categories (name) VALUES ('Online')")
-    cursor.execute("INSERT OR IGNORE INTO categories (name) VALUES ('Offline')")
-    
-    # Events table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS events (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        category_id INTEGER,
-        image_id TEXT,
-        description TEXT,
-        time_info TEXT,
-        event_date TEXT,
-        max_participants INTEGER DEFAULT 0,
-        location TEXT,
-        FOREIGN KEY (category_id) REFERENCES categories (id)
-    )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS registrations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        event_id INTEGER,
-        FOREIGN KEY (user_id) REFERENCES users (user_id),
-        FOREIGN KEY (event_id) REFERENCES events (id)
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with get_cursor(commit=True) as cursor:
+        # Users table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            full_name TEXT,
+            phone TEXT,
+            language TEXT
+        )
+        ''')
+
+        # Categories table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE
+        )
+        ''')
+
+        # Pre-populate default categories if not exist
+        cursor.execute("INSERT OR IGNORE INTO categories (name) VALUES ('Online')")
+        cursor.execute("INSERT OR IGNORE INTO categories (name) VALUES ('Offline')")
+
+        # Events table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_id INTEGER,
+            image_id TEXT,
+            description TEXT,
+            time_info TEXT,
+            event_date TEXT,
+            max_participants INTEGER DEFAULT 0,
+            location TEXT,
+            FOREIGN KEY (category_id) REFERENCES categories (id)
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS registrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            event_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users (user_id),
+            FOREIGN KEY (event_id) REFERENCES events (id)
+        )
+        ''')
+
+        # Users who blocked the bot are skipped by broadcasts
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS blocked_users (
+            user_id INTEGER PRIMARY KEY
+        )
+        ''')
+
+        # Broadcast outbox: one row per job, one row per attempted recipient
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_key TEXT,
+            admin_chat_id INTEGER,
+            admin_lang TEXT,
+            status TEXT DEFAULT 'pending',
+            cursor INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            status_message_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            job_id INTEGER,
+            user_id INTEGER,
+            status TEXT,
+            attempts INTEGER DEFAULT 0,
+            PRIMARY KEY (job_id, user_id)
+        )
+        ''')
+
+    with _lock:
+        migrations.migrate(get_connection())
 
 def add_user(user_id, full_name, phone, language):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("INSERT OR REPLACE INTO users (user_id, full_name, phone, language) VALUES (?, ?, ?, ?)", 
-                   (user_id, full_name, phone, language))
-    conn.commit()
-    conn.close()
+    normalized = normalize_phone(phone)
+    with get_cursor(commit=True) as cursor:
+        cursor.execute('''
+            INSERT OR REPLACE INTO users (user_id, full_name, phone, language, phone_normalized, phone_reversed)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, full_name, phone, language, normalized, normalized[::-1]))
+        cursor.execute("DELETE FROM blocked_users WHERE user_id = ?", (user_id,))
+    user_cache.invalidate(user_id)
+
+def get_cached_user(user_id):
+    """Cached user row (None for unknown users) or NOT_CACHED"""
+    return user_cache.get(user_id, NOT_CACHED)
+
+def load_user(user_id):
+    """Read the user row from the database and refresh the cache"""
+    with get_cursor() as cursor:
+        cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
+        user = cursor.fetchone()
+    user_cache.set(user_id, user)
+    return user
 
 def get_user(user_id):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
+    user = get_cached_user(user_id)
+    if user is NOT_CACHED:
+        user = load_user(user_id)
     return user
 
+def get_user_cache_stats():
+    return user_cache.stats()
+
 def update_user_lang(user_id, language):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET language = ? WHERE user_id = ?", (language, user_id))
-    conn.commit()
-    conn.close()
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE users SET language = ? WHERE user_id = ?", (language, user_id))
+    user_cache.invalidate(user_id)
 
 def update_user_name(user_id, full_name):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET full_name = ? WHERE user_id = ?", (full_name, user_id))
-    conn.commit()
-    conn.close()
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE users SET full_name = ? WHERE user_id = ?", (full_name, user_id))
+    user_cache.invalidate(user_id)
 
 def update_user_phone(user_id, phone):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET phone = ? WHERE user_id = ?", (phone, user_id))
-    conn.commit()
-    conn.close()
+    normalized = normalize_phone(phone)
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE users SET phone = ?, phone_normalized = ?, phone_reversed = ? WHERE user_id = ?",
+                       (phone, normalized, normalized[::-1], user_id))
+    user_cache.invalidate(user_id)
 
 def is_user_registered(user_id, event_id):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM registrations WHERE user_id = ? AND event_id = ?", (user_id, event_id))
-    reg = cursor.fetchone()
-    conn.close()
-    return reg is not None
+    with get_cursor() as cursor:
+        cursor.execute("SELECT id FROM registrations WHERE user_id = ? AND event_id = ?", (user_id, event_id))
+        return cursor.fetchone() is not None
 
 def register_user_local(user_id, event_id):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO registrations (user_id, event_id) VALUES (?, ?)", (user_id, event_id))
-    conn.commit()
-    conn.close()
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("INSERT OR IGNORE INTO registrations (user_id, event_id) VALUES (?, ?)", (user_id, event_id))
+
+class SeatReservation(Enum):
+    OK = "ok"
+    FULL = "full"
+    ALREADY_REGISTERED = "already_registered"
+    NOT_FOUND = "not_found"
+
+def reserve_seat(user_id, event_id):
+    """Register the user if the event still has a free seat, as one atomic step"""
+    with transaction() as cursor:
+        cursor.execute('''
+            INSERT OR IGNORE INTO registrations (user_id, event_id)
+            SELECT ?, e.id
+            FROM events e
+            WHERE e.id = ?
+              AND (e.max_participants <= 0 OR e.registered_count < e.max_participants)
+        ''', (user_id, event_id))
+        if cursor.rowcount == 1:
+            return SeatReservation.OK
+
+        # Nothing inserted: find out why
+        cursor.execute('''
+            SELECT EXISTS (SELECT 1 FROM registrations WHERE user_id = ? AND event_id = e.id)
+            FROM events e
+            WHERE e.id = ?
+        ''', (user_id, event_id))
+        row = cursor.fetchone()
+        if row is None:
+            return SeatReservation.NOT_FOUND
+        if row[0]:
+            return SeatReservation.ALREADY_REGISTERED
+        return SeatReservation.FULL
 
 def get_registrations_by_event(event_id):
     """Get all registered users for a specific event"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT u.user_id, u.full_name, u.phone
-        FROM registrations r
-        JOIN users u ON r.user_id = u.user_id
-        WHERE r.event_id = ?
-    ''', (event_id,))
-    registrations = cursor.fetchall()
-    conn.close()
-    return registrations
+    with get_cursor() as cursor:
+        cursor.execute('''
+            SELECT u.user_id, u.full_name, u.phone
+            FROM registrations r
+            JOIN users u ON r.user_id = u.user_id
+            WHERE r.event_id = ?
+            ORDER BY r.id
+        ''', (event_id,))
+        return cursor.fetchall()
+
+def get_registered_participant(event_id, user_id):
+    """(user_id, full_name, phone) if the user is registered for the event, else None"""
+    with get_cursor() as cursor:
+        cursor.execute('''
+            SELECT u.user_id, u.full_name, u.phone
+            FROM registrations r
+            JOIN users u ON r.user_id = u.user_id
+            WHERE r.user_id = ? AND r.event_id = ?
+        ''', (user_id, event_id))
+        return cursor.fetchone()
+
+# Shortest tail of a number a moderator may type instead of the full phone
+MIN_PHONE_SUFFIX = 7
+
+def find_participant_by_phone(event_id, phone):
+    """
+    Registered participant of the event whose phone matches, as
+    (user_id, full_name, phone), or None. An exact match on the normalized
+    number wins; otherwise the input is treated as the last digits of the
+    number, which is a range scan on the reversed-phone index.
+    """
+    digits = normalize_phone(phone)
+    if not digits:
+        return None
+    with get_cursor() as cursor:
+        cursor.execute('''
+            SELECT u.user_id, u.full_name, u.phone
+            FROM users u
+            WHERE u.phone_normalized = ?
+              AND EXISTS (SELECT 1 FROM registrations r WHERE r.user_id = u.user_id AND r.event_id = ?)
+        ''', (digits, event_id))
+        found = cursor.fetchone()
+        if found or len(digits) < MIN_PHONE_SUFFIX:
+            return found
+        # All numbers ending in `digits` start with its reverse; ":" sorts
+        # right after "9", so this is the whole prefix range
+        prefix = digits[::-1]
+        cursor.execute('''
+            SELECT u.user_id, u.full_name, u.phone
+            FROM users u
+            WHERE u.phone_reversed >= ? AND u.phone_reversed < ?
+              AND EXISTS (SELECT 1 FROM registrations r WHERE r.user_id = u.user_id AND r.event_id = ?)
+            LIMIT 1
+        ''', (prefix, prefix + ":", event_id))
+        return cursor.fetchone()
+
+def get_checkin_roster(event_id):
+    """(user_id, full_name, phone, phone_normalized) for every registration of the event"""
+    with get_cursor() as cursor:
+        cursor.execute('''
+            SELECT u.user_id, u.full_name, u.phone, u.phone_normalized
+            FROM registrations r
+            JOIN users u ON r.user_id = u.user_id
+            WHERE r.event_id = ?
+        ''', (event_id,))
+        return cursor.fetchall()
+
+def get_roster_version():
+    """Bumped by triggers on changes that can make a check-in index stale (migration 9)"""
+    with get_cursor() as cursor:
+        cursor.execute("SELECT version FROM roster_version WHERE id = 1")
+        return cursor.fetchone()[0]
+
+def mark_attended(event_id, user_ids):
+    """Check the users in; returns the ids that were not checked in before"""
+    checked_in = []
+    with transaction() as cursor:
+        for user_id in user_ids:
+            cursor.execute('''
+                UPDATE registrations SET attended_at = CURRENT_TIMESTAMP
+                WHERE user_id = ? AND event_id = ? AND attended_at IS NULL
+            ''', (user_id, event_id))
+            if cursor.rowcount:
+                checked_in.append(user_id)
+    return checked_in
+
+def get_attendance_counts(event_id):
+    """(checked_in, registered) for the event"""
+    with get_cursor() as cursor:
+        cursor.execute("SELECT COUNT(attended_at), COUNT(*) FROM registrations WHERE event_id = ?", (event_id,))
+        return cursor.fetchone()
+
+def enqueue_sheet_export(event_id, full_name, phone):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("INSERT INTO sheet_exports (event_id, full_name, phone) VALUES (?, ?, ?)",
+                       (event_id, full_name, phone))
+
+def get_pending_sheet_exports(limit):
+    with get_cursor() as cursor:
+        cursor.execute("SELECT id, event_id, full_name, phone FROM sheet_exports ORDER BY id LIMIT ?", (limit,))
+        return cursor.fetchall()
+
+def get_event_sheet_snapshot(event_id):
+    """
+    (registrations, high_water) for a full sync of one event: its
+    (full_name, phone) rows and the last sheet_exports id, read together.
+    Queued rows of the event up to high_water are covered by the snapshot.
+    """
+    with transaction() as cursor:
+        cursor.execute('''
+            SELECT u.full_name, u.phone
+            FROM registrations r
+            JOIN users u ON r.user_id = u.user_id
+            WHERE r.event_id = ?
+            ORDER BY r.id
+        ''', (event_id,))
+        registrations = cursor.fetchall()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM sheet_exports")
+        return registrations, cursor.fetchone()[0]
+
+def delete_event_sheet_exports(event_id, high_water):
+    """Drop the event's queued rows up to high_water once a full sync has written them"""
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM sheet_exports WHERE event_id = ? AND id <= ?", (event_id, high_water))
+
+def delete_sheet_exports(export_ids):
+    with get_cursor(commit=True) as cursor:
+        cursor.executemany("DELETE FROM sheet_exports WHERE id = ?", [(i,) for i in export_ids])
 
 def get_all_users():
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id FROM users")
-    users = cursor.fetchall()
-    conn.close()
-    return [u[0] for u in users]
+    with get_cursor() as cursor:
+        cursor.execute("SELECT user_id FROM users")
+        return [u[0] for u in cursor.fetchall()]
+
+def mark_users_blocked(user_ids):
+    with get_cursor(commit=True) as cursor:
+        cursor.executemany("INSERT OR IGNORE INTO blocked_users (user_id) VALUES (?)",
+                           [(uid,) for uid in user_ids])
+
+def unblock_user(user_id):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM blocked_users WHERE user_id = ?", (user_id,))
+
+def _insert_broadcast_job(cursor, message_key, admin_chat_id, admin_lang):
+    cursor.execute("SELECT COUNT(*) FROM users WHERE user_id NOT IN (SELECT user_id FROM blocked_users)")
+    total = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO broadcast_jobs (message_key, admin_chat_id, admin_lang, total) VALUES (?, ?, ?, ?)",
+                   (message_key, admin_chat_id, admin_lang, total))
+    return cursor.lastrowid
+
+def create_broadcast_job(message_key, admin_chat_id, admin_lang):
+    with get_cursor(commit=True) as cursor:
+        return _insert_broadcast_job(cursor, message_key, admin_chat_id, admin_lang)
+
+def get_next_broadcast_job():
+    """Oldest unfinished job, including one interrupted by a restart"""
+    with get_cursor() as cursor:
+        cursor.execute('''
+            SELECT id, message_key, admin_chat_id, admin_lang, status, cursor, total, status_message_id,
+                   (SELECT COUNT(*) FROM broadcast_deliveries d WHERE d.job_id = broadcast_jobs.id)
+            FROM broadcast_jobs
+            WHERE status IN ('pending', 'running')
+            ORDER BY id
+            LIMIT 1
+        ''')
+        return cursor.fetchone()
+
+def get_broadcast_batch(job_id, after_user_id, limit):
+    """Next recipients after the job cursor that have not been attempted yet"""
+    with get_cursor() as cursor:
+        cursor.execute('''
+            SELECT u.user_id, u.language
+            FROM users u
+            WHERE u.user_id > ?
+              AND u.user_id NOT IN (SELECT user_id FROM blocked_users)
+              AND NOT EXISTS (SELECT 1 FROM broadcast_deliveries d
+                              WHERE d.job_id = ? AND d.user_id = u.user_id)
+            ORDER BY u.user_id
+            LIMIT ?
+        ''', (after_user_id, job_id, limit))
+        return cursor.fetchall()
+
+def record_broadcast_delivery(job_id, user_id, status):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute('''
+            INSERT INTO broadcast_deliveries (job_id, user_id, status, attempts) VALUES (?, ?, ?, 1)
+            ON CONFLICT (job_id, user_id) DO UPDATE SET status = excluded.status, attempts = attempts + 1
+        ''', (job_id, user_id, status))
+
+def start_broadcast_job(job_id, status_message_id):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE broadcast_jobs SET status = 'running', status_message_id = ? WHERE id = ?",
+                       (status_message_id, job_id))
+
+def set_broadcast_job_cursor(job_id, cursor_user_id):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE broadcast_jobs SET cursor = ? WHERE id = ?", (cursor_user_id, job_id))
+
+def finish_broadcast_job(job_id):
+    """Mark the job done and return its delivery counts by status"""
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE broadcast_jobs SET status = 'done' WHERE id = ?", (job_id,))
+        cursor.execute("SELECT status, COUNT(*) FROM broadcast_deliveries WHERE job_id = ? GROUP BY status", (job_id,))
+        return dict(cursor.fetchall())
+
+def fail_broadcast_job(job_id):
+    """Give up on a job that keeps failing, so the jobs queued after it can run"""
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE broadcast_jobs SET status = 'failed' WHERE id = ?", (job_id,))
+
+def request_sheet_sync(admin_chat_id, admin_lang):
+    """Queue a full Sheets sync; returns None if one is already queued or running"""
+    with transaction() as cursor:
+        cursor.execute("SELECT 1 FROM sheet_sync_requests WHERE status IN ('pending', 'running')")
+        if cursor.fetchone():
+            return None
+        cursor.execute("INSERT INTO sheet_sync_requests (admin_chat_id, admin_lang) VALUES (?, ?)",
+                       (admin_chat_id, admin_lang))
+        return cursor.lastrowid
+
+def get_next_sheet_sync():
+    """(id, admin_chat_id, admin_lang, status) of the unfinished sync request, if any"""
+    with get_cursor() as cursor:
+        cursor.execute('''
+            SELECT id, admin_chat_id, admin_lang, status FROM sheet_sync_requests
+            WHERE status IN ('pending', 'running')
+            ORDER BY id
+            LIMIT 1
+        ''')
+        return cursor.fetchone()
+
+def set_sheet_sync_status(request_id, status):
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE sheet_sync_requests SET status = ? WHERE id = ?", (status, request_id))
 
 def add_category(name):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO categories (name) VALUES (?)", (name,))
-        conn.commit()
+        with get_cursor(commit=True) as cursor:
+            cursor.execute("INSERT INTO categories (name) VALUES (?)", (name,))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 def get_categories():
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM categories")
-    cats = cursor.fetchall()
-    conn.close()
-    return cats
+    with get_cursor() as cursor:
+        cursor.execute("SELECT id, name FROM categories")
+        return cursor.fetchall()
 
-def add_event(category_id, image_id, description, time_info, event_date, max_participants=0, location=None):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
+def _insert_event(cursor, category_id, image_id, description, time_info, event_date, max_participants=0, location=None):
     cursor.execute("INSERT INTO events (category_id, image_id, description, time_info, event_date, max_participants, location) VALUES (?, ?, ?, ?, ?, ?, ?)",
                    (category_id, image_id, description, time_info, event_date, max_participants, location))
-    conn.commit()
-    conn.close()
+    return cursor.lastrowid
+
+def add_event(category_id, image_id, description, time_info, event_date, max_participants=0, location=None):
+    with get_cursor(commit=True) as cursor:
+        _insert_event(cursor, category_id, image_id, description, time_info, event_date, max_participants, location)
+
+def add_event_with_broadcast(message_key, admin_chat_id, admin_lang, *event):
+    """
+    Create the event (add_event's arguments) and its announcement job in one
+    transaction, so an event never exists without its notification queued.
+    Returns (event_id, job_id).
+    """
+    with transaction() as cursor:
+        event_id = _insert_event(cursor, *event)
+        return event_id, _insert_broadcast_job(cursor, message_key, admin_chat_id, admin_lang)
 
 def get_event_participants_count(event_id):
     """Get the number of registered participants for an event"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM registrations WHERE event_id = ?", (event_id,))
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    with get_cursor() as cursor:
+        cursor.execute("SELECT registered_count FROM events WHERE id = ?", (event_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+def repair_registered_counts():
+    """Recompute registered_count from registrations; returns the number of events fixed"""
+    with get_cursor(commit=True) as cursor:
+        cursor.execute('''
+            UPDATE events
+            SET registered_count = (SELECT COUNT(*) FROM registrations r WHERE r.event_id = events.id)
+            WHERE registered_count != (SELECT COUNT(*) FROM registrations r WHERE r.event_id = events.id)
+        ''')
+        return cursor.rowcount
 
 def get_events_by_category(category_name):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-    SELECT e.image_id, e.description, e.time_info 
-    FROM events e
-    JOIN categories c ON e.category_id = c.id
-    WHERE c.name = ?
-    ''', (category_name,))
-    events = cursor.fetchall()
-    conn.close()
-    return events
+    with get_cursor() as cursor:
+        cursor.execute('''
+        SELECT e.image_id, e.description, e.time_info 
+        FROM events e
+        JOIN categories c ON e.category_id = c.id
+        WHERE c.name = ?
+        ''', (category_name,))
+        return cursor.fetchall()
+
+def get_events_after(after_id, limit):
+    """(id, description) of events with id > after_id, for walking all events in pages"""
+    with get_cursor() as cursor:
+        cursor.execute("SELECT id, description FROM events WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))
+        return cursor.fetchall()
 
 def get_all_events():
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-    SELECT e.id, c.name, e.description 
-    FROM events e
-    JOIN categories c ON e.category_id = c.id
-    ''')
-    events = cursor.fetchall()
-    conn.close()
-    return events
+    with get_cursor() as cursor:
+        cursor.execute('''
+        SELECT e.id, c.name, e.description 
+        FROM events e
+        JOIN categories c ON e.category_id = c.id
+        ''')
+        return cursor.fetchall()
+
+def get_events_page(anchor_id, limit, backward=False):
+    """
+    Keyset page of all events in id order: up to `limit` (id, cat_name, desc)
+    rows after anchor_id, or before it when backward. Returns
+    (rows, has_prev, has_next).
+    """
+    with get_cursor() as cursor:
+        if backward:
+            condition, order = "e.id < ?", "DESC"
+        else:
+            condition, order = "e.id > ?", "ASC"
+        cursor.execute(f'''
+            SELECT e.id, c.name, e.description
+            FROM events e
+            JOIN categories c ON e.category_id = c.id
+            WHERE {condition}
+            ORDER BY e.id {order}
+            LIMIT ?
+        ''', (anchor_id, limit + 1))
+        rows = cursor.fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if not rows:
+            return rows, False, False
+        if backward:
+            rows.reverse()
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM events WHERE id > ?)", (rows[-1][0],))
+            return rows, more, bool(cursor.fetchone()[0])
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM events WHERE id < ?)", (rows[0][0],))
+        return rows, bool(cursor.fetchone()[0]), more
 
 def get_event_by_id(event_id):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-    SELECT e.id, c.name, e.description, e.image_id, e.time_info, e.event_date, e.max_participants, e.location
-    FROM events e
-    JOIN categories c ON e.category_id = c.id
-    WHERE e.id = ?
-    ''', (event_id,))
-    event = cursor.fetchone()
-    conn.close()
-    return event
+    with get_cursor() as cursor:
+        cursor.execute('''
+        SELECT e.id, c.name, e.description, e.image_id, e.time_info, e.event_date, e.max_participants, e.location,
+               e.registered_count
+        FROM events e
+        JOIN categories c ON e.category_id = c.id
+        WHERE e.id = ?
+        ''', (event_id,))
+        return cursor.fetchone()
 
 def delete_event(event_id):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    # Delete registrations first to maintain integrity
-    cursor.execute("DELETE FROM registrations WHERE event_id = ?", (event_id,))
-    cursor.execute("DELETE FROM events WHERE id = ?", (event_id,))
-    conn.commit()
-    conn.close()
+    with get_cursor(commit=True) as cursor:
+        # Delete registrations first to maintain integrity
+        cursor.execute("DELETE FROM registrations WHERE event_id = ?", (event_id,))
+        cursor.execute("DELETE FROM events WHERE id = ?", (event_id,))
 
 def update_event_field(event_id, field, value):
     # Whitelist allowed fields to prevent SQL injection
@@ -219,10 +619,75 @@ def update_event_field(event_id, field, value):
     if field not in allowed_fields:
         return False
         
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    query = f"UPDATE events SET {field} = ? WHERE id = ?"
-    cursor.execute(query, (value, event_id))
-    conn.commit()
-    conn.close()
+    with get_cursor(commit=True) as cursor:
+        query = f"UPDATE events SET {field} = ? WHERE id = ?"
+        cursor.execute(query, (value, event_id))
     return True
+
+# Carousel card: the event, its registration count and whether it has
+# neighbours in its category
+_EVENT_CARD = '''
+    SELECT e.id, e.image_id, e.description, e.time_info, e.event_date, e.max_participants, e.location,
+           e.registered_count,
+           EXISTS (SELECT 1 FROM events p WHERE p.category_id = e.category_id AND p.id < e.id),
+           EXISTS (SELECT 1 FROM events n WHERE n.category_id = e.category_id AND n.id > e.id)
+    FROM events e
+'''
+
+def get_first_event_card(category_name):
+    """
+    First event of the category as (id, image_id, description, time_info,
+    event_date, max_participants, location, registered_count, has_prev, has_next)
+    """
+    with get_cursor() as cursor:
+        cursor.execute(_EVENT_CARD + '''
+            JOIN categories c ON e.category_id = c.id
+            WHERE c.name = ?
+            ORDER BY e.id
+            LIMIT 1
+        ''', (category_name,))
+        return cursor.fetchone()
+
+def get_adjacent_event_card(event_id, backward=False):
+    """The next (or previous) event card in the same category as event_id"""
+    with get_cursor() as cursor:
+        if backward:
+            condition, order = "e.id < ?", "DESC"
+        else:
+            condition, order = "e.id > ?", "ASC"
+        cursor.execute(_EVENT_CARD + f'''
+            WHERE e.category_id = (SELECT category_id FROM events WHERE id = ?)
+              AND {condition}
+            ORDER BY e.id {order}
+            LIMIT 1
+        ''', (event_id, event_id))
+        return cursor.fetchone()
+
+def get_event_seats(event_id):
+    """(max_participants, registered_count), or None if the event does not exist"""
+    with get_cursor() as cursor:
+        cursor.execute("SELECT max_participants, registered_count FROM events WHERE id = ?", (event_id,))
+        return cursor.fetchone()
+
+def load_fsm_state(key, min_updated_at):
+    """(state, data json) stored for an FSM key, or None if unset or last written before min_updated_at"""
+    with get_cursor() as cursor:
+        cursor.execute("SELECT state, data FROM fsm_states WHERE key = ? AND updated_at >= ?", (key, min_updated_at))
+        return cursor.fetchone()
+
+def save_fsm_states(rows):
+    """Write (key, state, data json, updated_at) rows in one transaction; keys with no state and no data are deleted"""
+    cleared = [(key,) for key, state, data, _ in rows if state is None and data == "{}"]
+    with get_cursor(commit=True) as cursor:
+        cursor.executemany("DELETE FROM fsm_states WHERE key = ?", cleared)
+        cursor.executemany('''
+            INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE
+            SET state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+        ''', [row for row in rows if row[1] is not None or row[2] != "{}"])
+
+def delete_stale_fsm_states(before):
+    """Drop FSM states last written before `before`; returns how many"""
+    with get_cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM fsm_states WHERE updated_at < ?", (before,))
+        return cursor.rowcount
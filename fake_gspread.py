@@ -0,0 +1,96 @@
+"""
+In-memory stand-in for the parts of gspread the bot uses.
+
+Selected with SHEETS_BACKEND=fake so the export pipeline can run locally
+without Google credentials. `Client.calls` counts the requests that would
+have been sent to the API.
+"""
+import gspread
+
+class Worksheet:
+    """
+    Like gspread, `row_count` is the size cached when the worksheet was
+    fetched: appends grow the real grid (`grid_rows`) without updating it,
+    and add_rows resizes to the cached count plus `rows`.
+    """
+
+    def __init__(self, client, title, rows=100, cols=26):
+        self._client = client
+        self.title = title
+        self.row_count = self.grid_rows = rows
+        self.values = []
+
+    def append_row(self, values, **kwargs):
+        self._client.calls += 1
+        self.values.append([str(v) for v in values])
+        self.grid_rows = max(self.grid_rows, len(self.values))
+
+    def append_rows(self, values, **kwargs):
+        self._client.calls += 1
+        self.values.extend([str(v) for v in row] for row in values)
+        self.grid_rows = max(self.grid_rows, len(self.values))
+
+    def get_all_values(self):
+        self._client.calls += 1
+        return [list(row) for row in self.values]
+
+    def add_rows(self, rows):
+        self.resize(rows=self.row_count + rows)
+
+    def resize(self, rows=None, cols=None):
+        """Rows past the new size are lost, as in Google Sheets"""
+        self._client.calls += 1
+        if rows is not None:
+            self.row_count = self.grid_rows = rows
+            del self.values[rows:]
+
+    def update(self, range_name, values, **kwargs):
+        """Only "A<row>" ranges are supported"""
+        self._client.calls += 1
+        start = int(range_name[1:]) - 1
+        if start + len(values) > self.grid_rows:
+            raise ValueError("range exceeds grid limits")
+        self.values.extend([] for _ in range(start + len(values) - len(self.values)))
+        for i, row in enumerate(values):
+            self.values[start + i] = [str(v) for v in row]
+        while self.values and not any(self.values[-1]):
+            self.values.pop()
+
+class Spreadsheet:
+    def __init__(self, client, title):
+        self._client = client
+        self.title = title
+        self._worksheets = [Worksheet(client, "Sheet1")]
+
+    def worksheets(self):
+        self._client.calls += 1
+        return list(self._worksheets)
+
+    def worksheet(self, title):
+        self._client.calls += 1
+        for ws in self._worksheets:
+            if ws.title == title:
+                return ws
+        raise gspread.WorksheetNotFound(title)
+
+    def add_worksheet(self, title, rows, cols):
+        self._client.calls += 1
+        ws = Worksheet(self._client, title, rows, cols)
+        self._worksheets.append(ws)
+        return ws
+
+class Client:
+    def __init__(self):
+        self.calls = 0
+        self._spreadsheets = {}
+
+    def open(self, title):
+        self.calls += 1
+        if title not in self._spreadsheets:
+            raise gspread.SpreadsheetNotFound(title)
+        return self._spreadsheets[title]
+
+    def create(self, title):
+        self.calls += 1
+        self._spreadsheets[title] = Spreadsheet(self, title)
+        return self._spreadsheets[title]
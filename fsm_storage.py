@@ -0,0 +1,141 @@
+"""
+FSM storage selected by FSM_STORAGE.
+
+"sqlite" (the default) keeps states in the bot's own database, so a
+half-finished flow survives a restart:
+- Reads go through an in-memory cache of at most FSM_CACHE_SIZE states.
+  Only a miss touches the database.
+- Writes update the cache at once and reach the database in batches,
+  every FLUSH_INTERVAL seconds or after FLUSH_SIZE changes.
+- States nobody has written for FSM_STATE_TTL seconds are treated as
+  abandoned and deleted.
+
+A hard crash loses at most the last FLUSH_INTERVAL seconds of changes.
+close() writes out everything pending.
+
+"memory" is aiogram's MemoryStorage: fast, but every multi-step flow is
+lost on restart and abandoned states are never freed. "redis" keeps states
+in REDIS_URL; the redis package is only needed for that backend.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from async_database import delete_stale_fsm_states, load_fsm_state, save_fsm_states
+from cache import TTLCache
+from config import FSM_CACHE_SIZE, FSM_STATE_TTL, FSM_STORAGE, REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1  # seconds
+FLUSH_SIZE = 200  # pending changes that trigger an early flush
+CACHE_TTL = 600  # seconds a state is served from memory without a reread
+EXPIRE_INTERVAL = 3600  # seconds between sweeps of abandoned states
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, ttl=FSM_STATE_TTL, cache_size=FSM_CACHE_SIZE):
+        self.ttl = ttl
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache = TTLCache(maxsize=cache_size, ttl=min(CACHE_TTL, ttl))  # key -> (state, data)
+        self._dirty = {}  # key -> (state, data, data json, updated_at), not saved yet
+        self._saving = {}  # the batch being saved
+        self._flush_now = asyncio.Event()
+        self._flusher = None
+
+    async def _load(self, key):
+        pending = self._dirty.get(key) or self._saving.get(key)
+        if pending is not None:
+            return pending[:2]
+        entry = self._cache.get(key)
+        if entry is None:
+            row = await load_fsm_state(key, time.time() - self.ttl)
+            # A write may have landed while the row was being read
+            entry = self._cache.get(key)
+            if entry is None:
+                entry = (row[0], json.loads(row[1])) if row else (None, {})
+                self._cache.set(key, entry)
+        return entry
+
+    def _write(self, key, state, data):
+        # Serialized here so a bad value fails in the handler that stored it
+        self._dirty[key] = (state, data, json.dumps(data), time.time())
+        self._cache.set(key, (state, data))
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+        if len(self._dirty) >= FLUSH_SIZE:
+            self._flush_now.set()
+
+    async def set_state(self, key, state=None):
+        key = self.key_builder.build(key)
+        _, data = await self._load(key)
+        self._write(key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key):
+        state, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key, data):
+        key = self.key_builder.build(key)
+        state, _ = await self._load(key)
+        self._write(key, state, dict(data))
+
+    async def get_data(self, key):
+        _, data = await self._load(self.key_builder.build(key))
+        return dict(data)
+
+    async def flush(self):
+        """Save every pending change in one transaction"""
+        if not self._dirty:
+            return
+        self._saving, self._dirty = self._dirty, {}
+        try:
+            await save_fsm_states([(key, state, data_json, updated_at)
+                                   for key, (state, _, data_json, updated_at) in self._saving.items()])
+        except Exception:
+            # Retry with the next batch; changes made since then win
+            self._dirty = {**self._saving, **self._dirty}
+            raise
+        finally:
+            self._saving = {}
+
+    async def _run(self):
+        next_expiry = 0
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+                if time.monotonic() >= next_expiry:
+                    removed = await delete_stale_fsm_states(time.time() - self.ttl)
+                    if removed:
+                        logger.info("Dropped %s abandoned FSM states", removed)
+                    next_expiry = time.monotonic() + EXPIRE_INTERVAL
+            except Exception:
+                logger.exception("Saving FSM states failed, retrying")
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+def create_storage(backend=FSM_STORAGE):
+    if backend == "sqlite":
+        return SQLiteStorage()
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "redis":
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError:
+            raise RuntimeError("FSM_STORAGE=redis needs the redis package: pip install redis")
+        return RedisStorage.from_url(REDIS_URL)
+    raise ValueError(f"Unknown FSM_STORAGE {backend!r}")
@@ -1,6 +1,13 @@
 import gspread
+from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
 import os
+import re
+import threading
+from collections import Counter
+
+from config import SHEETS_BACKEND
+import metrics
 
 # Scopes required for Google Sheets and Google Drive
 SCOPES = [
@@ -8,46 +15,160 @@ SCOPES = [
     "https://www.googleapis.com/auth/drive"
 ]
 
+SERVICE_ACCOUNT_FILE = "service_account.json"
 MASTER_SPREADSHEET_NAME = "Avlod Adventures - Event Registrations"
+HEADER = ["ФИО", "Номер телефона"]
+
+SHEETS_SECONDS = metrics.Histogram("bot_sheets_seconds", "Google Sheets writes, including worksheet lookup", ("operation",))
 
-def get_gc():
-    if not os.path.exists("service_account.json"):
-        return None
-    creds = Credentials.from_service_account_file("service_account.json", scopes=SCOPES)
-    return gspread.authorize(creds)
+def is_configured():
+    return SHEETS_BACKEND == "fake" or os.path.exists(SERVICE_ACCOUNT_FILE)
 
-def add_to_sheet(event_name, user_data):
+def event_sheet_title(event_id, description):
+    """
+    Worksheet titles start with "#<event_id> " so the sheet is still found
+    after the event description is edited.
     """
-    event_name: Name of the event (will be the worksheet title)
-    user_data: dict with {'full_name': ..., 'phone': ...}
+    text = re.sub(r"[\[\]:*?/\\\s]+", " ", description or "").strip()
+    return f"#{event_id} {text}"[:100]
+
+def is_quota_error(error):
+    response = getattr(error, "response", None)
+    return isinstance(error, gspread.exceptions.APIError) and getattr(response, "status_code", None) == 429
+
+class SheetsSession:
     """
-    gc = get_gc()
-    if not gc:
-        print("Google Sheets credentials not found.")
-        return False
-
-    try:
-        # Try to open existing master spreadsheet
-        try:
-            sh = gc.open(MASTER_SPREADSHEET_NAME)
-        except gspread.SpreadsheetNotFound:
-            # Create new master spreadsheet if not found
-            sh = gc.create(MASTER_SPREADSHEET_NAME)
-            # Share with anyone with the link (optional)
-            # sh.share(None, perm_type='anyone', role='reader')
-        
-        # Try to find worksheet for this event
-        try:
-            worksheet = sh.worksheet(event_name)
-        except gspread.WorksheetNotFound:
-            # Create new worksheet for this event
-            worksheet = sh.add_worksheet(title=event_name, rows=100, cols=5)
-            # Add headers
-            worksheet.append_row(["ФИО", "Номер телефона"])
-        
-        # Add user data
-        worksheet.append_row([user_data['full_name'], user_data['phone']])
-        return True
-    except Exception as e:
-        print(f"Error adding to Google Sheets: {e}")
-        return False
+    Long-lived handle on the master spreadsheet.
+
+    Credentials are loaded once and only refreshed when the token expires;
+    the spreadsheet handle and the title -> worksheet map (filled from one
+    metadata fetch) are reused, so a steady-state export is a single write
+    request. `calls` counts the API requests made through the session.
+    All methods block; call them from a worker thread.
+    """
+
+    def __init__(self, client, credentials=None):
+        self.client = client
+        self.credentials = credentials
+        self.calls = 0
+        self._spreadsheet = None
+        self._worksheets = None  # title -> worksheet
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        if SHEETS_BACKEND == "fake":
+            import fake_gspread
+            return cls(fake_gspread.Client())
+        if not os.path.exists(SERVICE_ACCOUNT_FILE):
+            return None
+        creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+        return cls(gspread.authorize(creds), creds)
+
+    def _ensure_token(self):
+        if self.credentials is not None and not self.credentials.valid:
+            self.credentials.refresh(Request())
+            self.calls += 1
+
+    @property
+    def spreadsheet(self):
+        if self._spreadsheet is None:
+            self._ensure_token()
+            self.calls += 1
+            try:
+                # Try to open existing master spreadsheet
+                self._spreadsheet = self.client.open(MASTER_SPREADSHEET_NAME)
+            except gspread.SpreadsheetNotFound:
+                # Create new master spreadsheet if not found
+                self.calls += 1
+                self._spreadsheet = self.client.create(MASTER_SPREADSHEET_NAME)
+        return self._spreadsheet
+
+    def worksheets(self):
+        """title -> worksheet, fetched once and then kept up to date locally"""
+        if self._worksheets is None:
+            sh = self.spreadsheet
+            self._ensure_token()
+            self.calls += 1
+            self._worksheets = {ws.title: ws for ws in sh.worksheets()}
+        return self._worksheets
+
+    def forget_worksheets(self):
+        """Drop the cached map, e.g. after a sheet was removed by hand"""
+        self._worksheets = None
+
+    def event_worksheet(self, event_id, description):
+        with self._lock:
+            prefix = f"#{event_id} "
+            worksheet = next((ws for title, ws in self.worksheets().items() if title.startswith(prefix)), None)
+            if worksheet is None:
+                # Create new worksheet for this event
+                self._ensure_token()
+                title = event_sheet_title(event_id, description)
+                worksheet = self.spreadsheet.add_worksheet(title=title, rows=100, cols=5)
+                worksheet.append_row(HEADER)
+                self.calls += 2
+                self._worksheets[title] = worksheet
+            return worksheet
+
+    def append_rows(self, event_id, description, rows):
+        """rows: list of [full_name, phone]"""
+        with SHEETS_SECONDS.time("append_rows"):
+            worksheet = self.event_worksheet(event_id, description)
+            self._ensure_token()
+            self.calls += 1
+            try:
+                worksheet.append_rows(rows, value_input_option="RAW")
+            except gspread.exceptions.APIError:
+                self.forget_worksheets()
+                raise
+
+    def reconcile(self, event_id, description, rows):
+        """
+        Make the event's worksheet match `rows` (header excluded) with a single
+        write. Everything from the first differing row down is rewritten and
+        leftover rows are blanked. Returns (rows_added, rows_removed).
+        """
+        with SHEETS_SECONDS.time("reconcile"):
+            return self._reconcile(event_id, description, rows)
+
+    def _reconcile(self, event_id, description, rows):
+        desired = [HEADER] + [[str(v) for v in row] for row in rows]
+        worksheet = self.event_worksheet(event_id, description)
+        self._ensure_token()
+        self.calls += 1
+        existing = [row[:len(HEADER)] for row in worksheet.get_all_values()]
+        # row_count is cached by gspread and stale after appends; the grid has
+        # at least as many rows as were just read
+        grid_rows = max(worksheet.row_count, len(existing))
+        existing = [row + [""] * (len(HEADER) - len(row)) for row in existing]
+        # Trailing blank rows are left over from earlier syncs
+        while existing and not any(existing[-1]):
+            existing.pop()
+
+        start = 0
+        while start < min(len(existing), len(desired)) and existing[start] == desired[start]:
+            start += 1
+        if start == len(existing) == len(desired):
+            return 0, 0
+
+        have, want = Counter(map(tuple, existing[1:])), Counter(map(tuple, desired[1:]))
+        added, removed = sum((want - have).values()), sum((have - want).values())
+
+        values = desired[start:] + [[""] * len(HEADER)] * (len(existing) - len(desired))
+        if start + len(values) > grid_rows:
+            # An absolute size: add_rows would resize to the stale row_count plus n
+            self.calls += 1
+            worksheet.resize(rows=start + len(values))
+        self.calls += 1
+        worksheet.update(range_name=f"A{start + 1}", values=values, value_input_option="RAW")
+        return added, removed
+
+_session = None
+
+def get_session():
+    """Process-wide session, or None when Sheets is not configured"""
+    global _session
+    if _session is None:
+        _session = SheetsSession.from_config()
+    return _session
@@ -1,15 +1,38 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from database import get_user, get_all_events, get_registrations_by_event
-from strings import STRINGS
+from async_database import get_all_events, get_attendance_counts
+from i18n import t
 from config import MODERATOR_PASSWORD
 import keyboards as kb
+import checkin
+from routing import CallbackPrefix
 
-router = Router()
+router = Router(name="moder")
+
+MAX_MESSAGE_LENGTH = 4096  # Telegram's limit for one text message, in UTF-16 code units
+
+def _length(text):
+    return len(text.encode("utf-16-le")) // 2
+
+def split_message(lines, limit=MAX_MESSAGE_LENGTH):
+    """Join lines into as few messages as fit under the limit, cutting over-long lines"""
+    chunks, current = [], ""
+    for line in lines:
+        if current and _length(current) + 1 + _length(line) > limit:
+            chunks.append(current)
+            current = ""
+        while _length(line) > limit:
+            # Half the limit in characters is safe even if every one is an emoji
+            chunks.append(line[:limit // 2])
+            line = line[limit // 2:]
+        current = current + "\n" + line if current else line
+    if current:
+        chunks.append(current)
+    return chunks
 
 class ModeratorState(StatesGroup):
     password = State()
@@ -18,25 +41,20 @@ class ModeratorState(StatesGroup):
     check_phone = State()
 
 @router.message(Command("moder"))
-async def moder_login(message: Message, state: FSMContext):
-    user = get_user(message.from_user.id)
-    lang = user[3] if user else "ru"
+async def moder_login(message: Message, state: FSMContext, lang: str):
     await state.set_state(ModeratorState.password)
-    await message.answer("Введите пароль модератора / Enter moderator password:")
+    await message.answer(t(lang, "moder_password"))
 
-@router.message(ModeratorState.password)
-async def process_moder_password(message: Message, state: FSMContext):
-    user = get_user(message.from_user.id)
-    lang = user[3] if user else "ru"
-    
+@router.message(StateFilter(ModeratorState.password))
+async def process_moder_password(message: Message, state: FSMContext, lang: str):
     if message.text == MODERATOR_PASSWORD:
         await state.set_state(ModeratorState.menu)
         
         # Get all events grouped by category
-        events = get_all_events()
+        events = await get_all_events()
         
         if not events:
-            await message.answer("Нет доступных ивентов / No events available")
+            await message.answer(t(lang, "moder_no_events"))
             await state.clear()
             return
         
@@ -46,58 +64,54 @@ async def process_moder_password(message: Message, state: FSMContext):
         
         # Send online events
         if online_events:
-            await message.answer("📱 Онлайн ивенты / Online Events:", 
+            await message.answer(t(lang, "moder_online_events"),
                                reply_markup=kb.get_moder_events_keyboard(online_events))
         
         # Send offline events
         if offline_events:
-            await message.answer("📍 Оффлайн ивенты / Offline Events:", 
+            await message.answer(t(lang, "moder_offline_events"),
                                reply_markup=kb.get_moder_events_keyboard(offline_events))
     else:
-        await message.answer("Неверный пароль / Wrong password")
+        await message.answer(t(lang, "wrong_pass"))
         await state.clear()
 
-@router.callback_query(ModeratorState.menu, F.data.startswith("moder_event_"))
-async def select_event(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(StateFilter(ModeratorState.menu), CallbackPrefix("moder_event_"))
+async def select_event(callback: CallbackQuery, state: FSMContext, lang: str):
     event_id = int(callback.data.split("_")[2])
     await state.update_data(event_id=event_id)
     await state.set_state(ModeratorState.check_phone)
+    await checkin.warm(event_id)
+    attended, registered = await get_attendance_counts(event_id)
     
     await callback.message.answer(
-        "Введите номер телефона для проверки:\n"
-        "Enter phone number to check:"
+        t(lang, "checkin_prompt") + "\n\n" +
+        t(lang, "checkin_counter", attended=attended, registered=registered)
     )
     await callback.answer()
 
-@router.message(ModeratorState.check_phone)
-async def check_participant(message: Message, state: FSMContext):
+@router.message(StateFilter(ModeratorState.check_phone))
+async def check_participant(message: Message, state: FSMContext, lang: str):
     data = await state.get_data()
     event_id = data['event_id']
-    phone = message.text.strip()
     
-    # Search for participant
-    registrations = get_registrations_by_event(event_id)
+    results = await checkin.check_in(event_id, message.text)
     
-    found = None
-    for user_id, full_name, user_phone in registrations:
-        if phone in user_phone or user_phone in phone:
-            found = (full_name, user_phone)
-            break
+    lines = []
+    for phone, status, participant in results:
+        if status == checkin.CHECKED_IN:
+            lines.append(t(lang, "checkin_ok", name=participant[1], phone=participant[2]))
+        elif status == checkin.ALREADY_CHECKED_IN:
+            lines.append(t(lang, "checkin_already", name=participant[1], phone=participant[2]))
+        elif status == checkin.INVALID_TICKET:
+            lines.append(t(lang, "checkin_invalid_ticket", code=phone))
+        elif status == checkin.WRONG_EVENT:
+            lines.append(t(lang, "checkin_wrong_event", code=phone))
+        else:
+            lines.append(t(lang, "checkin_not_found", phone=phone))
     
-    if found:
-        await message.answer(
-            f"✅ Участник найден / Participant found:\n\n"
-            f"ФИО / Name: {found[0]}\n"
-            f"Телефон / Phone: {found[1]}"
-        )
-    else:
-        await message.answer(
-            f"❌ Участник не найден / Participant not found\n\n"
-            f"Номер: {phone}"
-        )
-    
-    # Ask if want to check another
-    await message.answer(
-        "Введите следующий номер для проверки"
-        "Enter next number to check"
-    )
+    attended, registered = await get_attendance_counts(event_id)
+    lines.append("\n" + t(lang, "checkin_counter", attended=attended, registered=registered))
+    lines.append(t(lang, "checkin_next"))
+    # A long list of phones gets a long answer; the check-ins are already saved
+    for chunk in split_message(lines):
+        await message.answer(chunk)
@@ -1,18 +1,31 @@
+import asyncio
+import logging
+
 from aiogram import Router, F, Bot
-from aiogram.types import Message, ReplyKeyboardRemove, CallbackQuery
-from aiogram.filters import CommandStart
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, ReplyKeyboardRemove, CallbackQuery, BufferedInputFile, InputMediaPhoto
+from aiogram.filters import CommandStart, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from database import (add_user, get_user, update_user_lang, 
+from async_database import (add_user, update_user_lang, 
                       update_user_name, update_user_phone, 
                       get_events_by_category, get_all_events,
-                      is_user_registered, register_user_local)
-from strings import STRINGS
+                      is_user_registered, reserve_seat,
+                      get_first_event_card, get_adjacent_event_card,
+                      get_event_seats, unblock_user)
+from database import SeatReservation
+from i18n import t
 from config import SOCIAL_LINKS
+from sheets_export import enqueue_registration
 import keyboards as kb
+import tickets
+from routing import Button, CallbackPrefix, resolve
+
+router = Router(name="user")
 
-router = Router()
+logger = logging.getLogger(__name__)
 
 class Registration(StatesGroup):
     language = State()
@@ -24,178 +37,182 @@ class ProfileUpdate(StatesGroup):
     new_phone = State()
 
 @router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext):
+async def cmd_start(message: Message, state: FSMContext, user, lang: str):
     await state.clear()
-    user = get_user(message.from_user.id)
     if user:
-        lang = user[3]
-        await message.answer(STRINGS[lang]["main_menu"], reply_markup=kb.get_main_menu(lang))
+        # /start from a known user means they can receive messages again
+        await unblock_user(user[0])
+        await message.answer(t(lang, "main_menu"), reply_markup=kb.get_main_menu(lang))
     else:
         await state.set_state(Registration.language)
-        await message.answer("Please choose a language / Пожалуйста, выберите язык / Tilni tanlang:", reply_markup=kb.get_lang_keyboard())
+        await message.answer(t(lang, "choose_language"), reply_markup=kb.get_lang_keyboard())
 
-@router.message(Registration.language)
-async def process_language(message: Message, state: FSMContext):
-    lang_map = {"RU": "ru", "UZ": "uz", "EN": "en"}
-    if message.text in lang_map:
-        lang = lang_map[message.text]
+@router.message(StateFilter(Registration.language))
+async def process_language(message: Message, state: FSMContext, lang: str):
+    route = resolve(message.text)
+    if route and route[0] == "language":
+        lang = route[1]
         await state.update_data(language=lang)
         await state.set_state(Registration.full_name)
-        await message.answer(STRINGS[lang]["get_name"], reply_markup=ReplyKeyboardRemove())
+        await message.answer(t(lang, "get_name"), reply_markup=ReplyKeyboardRemove())
     else:
-        await message.answer("Please use the buttons.")
+        await message.answer(t(lang, "choose_language_buttons"))
 
-@router.message(Registration.full_name)
+@router.message(StateFilter(Registration.full_name))
 async def process_name(message: Message, state: FSMContext):
     data = await state.get_data()
     lang = data['language']
     await state.update_data(full_name=message.text)
     await state.set_state(Registration.phone)
-    await message.answer(STRINGS[lang]["get_phone"], reply_markup=kb.get_phone_keyboard(lang))
+    await message.answer(t(lang, "get_phone"), reply_markup=kb.get_phone_keyboard(lang))
 
-@router.message(Registration.phone, F.contact)
-@router.message(Registration.phone, F.text.regexp(r'^\+?[\d\s]{10,15}$'))
+@router.message(StateFilter(Registration.phone), F.contact)
+@router.message(StateFilter(Registration.phone), F.text.regexp(r'^\+?[\d\s]{10,15}$'))
 async def process_phone(message: Message, state: FSMContext):
     data = await state.get_data()
     lang = data['language']
     name = data['full_name']
     phone = message.contact.phone_number if message.contact else message.text
     
-    add_user(message.from_user.id, name, phone, lang)
+    await add_user(message.from_user.id, name, phone, lang)
     await state.clear()
-    await message.answer(STRINGS[lang]["main_menu"], reply_markup=kb.get_main_menu(lang))
+    await message.answer(t(lang, "main_menu"), reply_markup=kb.get_main_menu(lang))
+
+def _render_event_card(lang, card):
+    """(caption, reply_markup) of a carousel card"""
+    ev_id, img_id, desc, time_info, event_date, max_participants, location, registered_count, has_prev, has_next = card
+    date_str = f"📅 {event_date}\n" if event_date else ""
+    
+    # Calculate available spots
+    if max_participants > 0:
+        available = max_participants - registered_count
+        spots_str = t(lang, "spots", available=available, total=max_participants) + "\n"
+    else:
+        spots_str = t(lang, "spots_unlimited") + "\n"
+    
+    # Location string
+    loc_str = ""
+    if location:
+        loc_str = f"<a href='{location}'>{t(lang, 'location_label')}</a>\n"
+
+    caption = f"{desc}\n\n{date_str}{spots_str}{loc_str}🕒 {time_info}"
+    return caption, kb.get_event_card_keyboard(lang, ev_id, bool(has_prev), bool(has_next))
 
-@router.message(F.text.in_(["Онлайн ивенты", "Оффлайн ивенты", "Onlayn tadbirlar", "Offlayn tadbirlar", "Online Events", "Offline Events"]))
-async def show_events(message: Message):
-    user = get_user(message.from_user.id)
+async def _send_event_card(message, lang, card):
+    caption, reply_markup = _render_event_card(lang, card)
+    # Send with HTML parse mode for link
+    if card[1]:
+        await message.answer_photo(photo=card[1], caption=caption, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+    else:
+        await message.answer(caption, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+
+@router.message(Button("online_events", "offline_events"))
+async def show_events(message: Message, user, lang: str, button: str):
     if not user: return
-    lang = user[3]
     
-    cat_name = "Online" if any(x in message.text for x in ["нлайн", "nlayn", "Online"]) else "Offline"
+    cat_name = "Online" if button == "online_events" else "Offline"
     
-    # Get events with max_participants
-    from database import DATABASE_NAME, get_event_participants_count
-    import sqlite3
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT e.id, e.image_id, e.description, e.time_info, e.event_date, e.max_participants, e.location
-        FROM events e
-        JOIN categories c ON e.category_id = c.id
-        WHERE c.name = ?
-    ''', (cat_name,))
-    events = cursor.fetchall()
-    conn.close()
-
-    if not events:
-        await message.answer(STRINGS[lang]["no_events"])
+    # One message per category; the arrows flip it in place
+    card = await get_first_event_card(cat_name)
+    if not card:
+        await message.answer(t(lang, "no_events"))
         return
-        
-    for ev_id, img_id, desc, time_info, event_date, max_participants, location in events:
-        date_str = f"📅 {event_date}\n" if event_date else ""
-        
-        # Calculate available spots
-        if max_participants > 0:
-            registered_count = get_event_participants_count(ev_id)
-            available = max_participants - registered_count
-            spots_str = f"👥 Мест: {available}/{max_participants}\n" if lang == "ru" else \
-                       f"👥 O'rinlar: {available}/{max_participants}\n" if lang == "uz" else \
-                       f"👥 Spots: {available}/{max_participants}\n"
-        else:
-            spots_str = "👥 Мест: ∞\n" if lang == "ru" else \
-                       "👥 O'rinlar: ∞\n" if lang == "uz" else \
-                       "👥 Spots: ∞\n"
-        
-        # Location string
-        loc_str = ""
-        if location:
-            loc_label = "📍 Локация" if lang == "ru" else "📍 Joylashuv" if lang == "uz" else "📍 Location"
-            loc_str = f"<a href='{location}'>{loc_label}</a>\n"
-
-        caption = f"{desc}\n\n{date_str}{spots_str}{loc_str}🕒 {time_info}"
-        reply_markup = kb.get_event_reg_keyboard(lang, ev_id)
-        
-        # Send with HTML parse mode for link
-        from aiogram.enums import ParseMode
-        if img_id:
-            await message.answer_photo(photo=img_id, caption=caption, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
-        else:
-            await message.answer(caption, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
-
-@router.callback_query(F.data.startswith("reg_"))
-async def register_for_event(callback: CallbackQuery):
-    user = get_user(callback.from_user.id)
+    await _send_event_card(message, lang, card)
+
+@router.callback_query(CallbackPrefix("events_"))
+async def flip_event(callback: CallbackQuery, user, lang: str):
     if not user: return
+    _, direction, event_id = callback.data.split("_")
     
-    lang = user[3]
+    card = await get_adjacent_event_card(int(event_id), backward=direction == "prev")
+    if not card:
+        await callback.answer(t(lang, "no_events"))
+        return
+    
+    caption, reply_markup = _render_event_card(lang, card)
+    message = callback.message
+    if card[1] and message.photo:
+        media = InputMediaPhoto(media=card[1], caption=caption, parse_mode=ParseMode.HTML)
+        await message.edit_media(media, reply_markup=reply_markup)
+    elif not card[1] and not message.photo:
+        await message.edit_text(caption, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
+    else:
+        # Telegram cannot turn a text message into a photo or back
+        await message.delete()
+        await _send_event_card(message, lang, card)
+    await callback.answer()
+
+@router.callback_query(CallbackPrefix("reg_"))
+async def register_for_event(callback: CallbackQuery, user, lang: str):
+    if not user: return
     event_id = int(callback.data.split("_")[1])
     
-    if is_user_registered(user[0], event_id):
-        await callback.answer(STRINGS[lang]["already_reg"], show_alert=True)
+    if await is_user_registered(user[0], event_id):
+        await callback.answer(t(lang, "already_reg"), show_alert=True)
         return
 
     # Check if event is full
-    from database import DATABASE_NAME, get_event_participants_count
-    import sqlite3
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT max_participants FROM events WHERE id = ?", (event_id,))
-    result = cursor.fetchone()
-    conn.close()
+    seats = await get_event_seats(event_id)
     
-    if result:
-        max_participants = result[0]
-        if max_participants > 0:  # If there's a limit
-            current_count = get_event_participants_count(event_id)
-            if current_count >= max_participants:
-                await callback.answer(
-                    "❌ Мест нет / No spots available / O'rinlar yo'q",
-                    show_alert=True
-                )
-                return
+    if seats and seats[0] > 0:  # If there's a limit
+        max_participants, current_count = seats
+        if current_count >= max_participants:
+            await callback.answer(t(lang, "no_spots"), show_alert=True)
+            return
 
     # Show confirmation dialog
-    text = STRINGS[lang]["confirm_reg"].format(name=user[1], phone=user[2])
+    text = t(lang, "confirm_reg", name=user[1], phone=user[2])
     await callback.message.answer(text, reply_markup=kb.get_reg_confirm_keyboard(lang, event_id))
     await callback.answer()
 
-@router.callback_query(F.data.startswith("confirm_reg_"))
-async def confirm_registration(callback: CallbackQuery):
-    user = get_user(callback.from_user.id)
+async def _send_ticket(message, lang, event_id, user_id, heading):
+    """Send the signed ticket (as a QR code when possible) below `heading`"""
+    code = tickets.issue(event_id, user_id)
+    text = heading + "\n\n" + t(lang, "ticket_code", code=code)
+    qr = await asyncio.to_thread(tickets.qr_png, code)
+    if qr:
+        try:
+            await message.answer_photo(BufferedInputFile(qr, filename=f"ticket_{code}.png"), caption=text)
+            return
+        except TelegramBadRequest as e:
+            # The registration is saved; the text code is enough to check in
+            logger.warning("QR ticket %s rejected, sending the code only: %s", code, e)
+    await message.answer(text)
+
+@router.callback_query(CallbackPrefix("confirm_reg_"))
+async def confirm_registration(callback: CallbackQuery, user, lang: str):
     if not user: return
-    
-    lang = user[3]
     event_id = int(callback.data.split("_")[2])
     
-    if is_user_registered(user[0], event_id):
-        await callback.answer(STRINGS[lang]["already_reg"], show_alert=True)
+    # Capacity check and insert happen in one transaction, so concurrent
+    # taps can neither oversell the event nor register twice
+    result = await reserve_seat(user[0], event_id)
+    if result == SeatReservation.ALREADY_REGISTERED:
+        # Tickets are deterministic, so a user whose ticket never arrived
+        # (or got lost) gets the same one again
+        await _send_ticket(callback.message, lang, event_id, user[0], t(lang, "already_reg"))
+        await callback.answer(t(lang, "already_reg"), show_alert=True)
+        return
+    if result == SeatReservation.FULL:
+        await callback.answer(t(lang, "no_spots"), show_alert=True)
+        return
+    if result == SeatReservation.NOT_FOUND:
+        await callback.answer(t(lang, "event_not_found"), show_alert=True)
         return
 
-    # Check capacity again just in case
-    from database import DATABASE_NAME, get_event_participants_count
-    import sqlite3
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT max_participants FROM events WHERE id = ?", (event_id,))
-    result = cursor.fetchone()
-    conn.close()
-    
-    if result and result[0] > 0:
-        if get_event_participants_count(event_id) >= result[0]:
-            await callback.answer("❌ Мест нет / No spots available", show_alert=True)
-            return
+    await enqueue_registration(event_id, user[1], user[2])
+    try:
+        await callback.message.delete()
+    except TelegramBadRequest:
+        # Messages older than 48 hours cannot be deleted; the ticket matters more
+        pass
 
-    # Save registration to database
-    register_user_local(user[0], event_id)
-    await callback.message.delete()
-    await callback.message.answer(STRINGS[lang]["reg_success"])
+    await _send_ticket(callback.message, lang, event_id, user[0], t(lang, "reg_success"))
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_reg_"))
-async def edit_reg_data(callback: CallbackQuery, state: FSMContext):
-    user = get_user(callback.from_user.id)
+@router.callback_query(CallbackPrefix("edit_reg_"))
+async def edit_reg_data(callback: CallbackQuery, state: FSMContext, user, lang: str):
     if not user: return
-    lang = user[3]
     
     # data format: edit_reg_name_123 or edit_reg_phone_123
     parts = callback.data.split("_")
@@ -206,113 +223,93 @@ async def edit_reg_data(callback: CallbackQuery, state: FSMContext):
     
     if edit_type == "name":
         await state.set_state(ProfileUpdate.new_name)
-        await callback.message.answer(STRINGS[lang]["get_name"], reply_markup=ReplyKeyboardRemove())
+        await callback.message.answer(t(lang, "get_name"), reply_markup=ReplyKeyboardRemove())
     elif edit_type == "phone":
         await state.set_state(ProfileUpdate.new_phone)
-        await callback.message.answer(STRINGS[lang]["get_phone"], reply_markup=kb.get_phone_keyboard(lang))
+        await callback.message.answer(t(lang, "get_phone"), reply_markup=kb.get_phone_keyboard(lang))
     
     await callback.answer()
 
-@router.message(F.text.in_(["О нас", "Biz haqimizda", "About Us"]))
-async def about_us(message: Message):
-    user = get_user(message.from_user.id)
+@router.message(Button("about_us"))
+async def about_us(message: Message, user, lang: str):
     if not user: return
-    lang = user[3]
-    await message.answer(STRINGS[lang]["about_text"], reply_markup=kb.get_social_keyboard(SOCIAL_LINKS))
+    await message.answer(t(lang, "about_text"), reply_markup=kb.get_social_keyboard(SOCIAL_LINKS))
 
-@router.message(F.text.in_(["Настройки", "Sozlamalar", "Settings"]))
-async def settings(message: Message):
-    user = get_user(message.from_user.id)
+@router.message(Button("settings"))
+async def settings(message: Message, user, lang: str):
     if not user: return
-    lang = user[3]
     # Get language name for display
     lang_names = {"ru": "Русский", "uz": "O'zbek", "en": "English"}
     lang_display = lang_names.get(lang, lang)
-    text = STRINGS[lang]["curr_profile"].format(name=user[1], phone=user[2], lang=lang_display)
+    text = t(lang, "curr_profile", name=user[1], phone=user[2], lang=lang_display)
     await message.answer(text, reply_markup=kb.get_settings_keyboard(lang))
 
-@router.message(F.text.in_(["Главное меню", "Asosiy menyu", "Main Menu"]))
-async def back_to_main(message: Message):
-    user = get_user(message.from_user.id)
+@router.message(Button("main_menu"))
+async def back_to_main(message: Message, user, lang: str):
     if not user: return
-    lang = user[3]
-    await message.answer(STRINGS[lang]["main_menu"], reply_markup=kb.get_main_menu(lang))
+    await message.answer(t(lang, "main_menu"), reply_markup=kb.get_main_menu(lang))
 
-@router.message(F.text.in_(["Выбор языка", "Tilni tanlash", "Choose language"]))
-async def change_lang_menu(message: Message):
-    user = get_user(message.from_user.id)
+@router.message(Button("change_lang"))
+async def change_lang_menu(message: Message, user, lang: str):
     if not user: return
-    lang = user[3]
-    await message.answer(STRINGS[lang]["change_lang"], reply_markup=kb.get_lang_keyboard())
+    await message.answer(t(lang, "change_lang"), reply_markup=kb.get_lang_keyboard())
 
-@router.message(F.text.in_(["RU", "UZ", "EN"]))
-async def change_language(message: Message):
-    user = get_user(message.from_user.id)
+@router.message(Button("language"))
+async def change_language(message: Message, user, button_lang: str):
     if not user: return
     
-    lang_map = {"RU": "ru", "UZ": "uz", "EN": "en"}
-    new_lang = lang_map[message.text]
-    update_user_lang(message.from_user.id, new_lang)
-    await message.answer(STRINGS[new_lang]["main_menu"], reply_markup=kb.get_main_menu(new_lang))
-
-@router.message(F.text.in_(["Изменить ФИО", "FIO o'zgartirish", "Change Name"]))
-async def change_name_start(message: Message, state: FSMContext):
-    user = get_user(message.from_user.id)
+    new_lang = button_lang
+    await update_user_lang(message.from_user.id, new_lang)
+    await message.answer(t(new_lang, "main_menu"), reply_markup=kb.get_main_menu(new_lang))
+
+@router.message(Button("change_name"))
+async def change_name_start(message: Message, state: FSMContext, user, lang: str):
     if not user: return
-    lang = user[3]
     await state.set_state(ProfileUpdate.new_name)
-    await message.answer(STRINGS[lang]["get_name"], reply_markup=ReplyKeyboardRemove())
+    await message.answer(t(lang, "get_name"), reply_markup=ReplyKeyboardRemove())
 
-@router.message(ProfileUpdate.new_name)
-async def change_name_finish(message: Message, state: FSMContext):
-    user = get_user(message.from_user.id)
+@router.message(StateFilter(ProfileUpdate.new_name))
+async def change_name_finish(message: Message, state: FSMContext, user, lang: str):
     if not user: return
-    lang = user[3]
     
     # Check if we are in registration flow
     data = await state.get_data()
     reg_event_id = data.get('reg_event_id')
     
-    update_user_name(message.from_user.id, message.text)
-    user = get_user(message.from_user.id) # Refresh data
+    await update_user_name(message.from_user.id, message.text)
     
     await state.clear()
     
     if reg_event_id:
-        await message.answer(STRINGS[lang]["name_changed"])
-        text = STRINGS[lang]["confirm_reg"].format(name=user[1], phone=user[2])
+        await message.answer(t(lang, "name_changed"))
+        text = t(lang, "confirm_reg", name=message.text, phone=user[2])
         await message.answer(text, reply_markup=kb.get_reg_confirm_keyboard(lang, reg_event_id))
     else:
-        await message.answer(STRINGS[lang]["name_changed"], reply_markup=kb.get_settings_keyboard(lang))
+        await message.answer(t(lang, "name_changed"), reply_markup=kb.get_settings_keyboard(lang))
 
-@router.message(F.text.in_(["Изменить номер", "Raqamni o'zgartirish", "Change Phone"]))
-async def change_phone_start(message: Message, state: FSMContext):
-    user = get_user(message.from_user.id)
+@router.message(Button("change_phone"))
+async def change_phone_start(message: Message, state: FSMContext, user, lang: str):
     if not user: return
-    lang = user[3]
     await state.set_state(ProfileUpdate.new_phone)
-    await message.answer(STRINGS[lang]["get_phone"], reply_markup=kb.get_phone_keyboard(lang))
+    await message.answer(t(lang, "get_phone"), reply_markup=kb.get_phone_keyboard(lang))
 
-@router.message(ProfileUpdate.new_phone, F.contact)
-@router.message(ProfileUpdate.new_phone, F.text.regexp(r'^\+?[\d\s]{10,15}$'))
-async def change_phone_finish(message: Message, state: FSMContext):
-    user = get_user(message.from_user.id)
+@router.message(StateFilter(ProfileUpdate.new_phone), F.contact)
+@router.message(StateFilter(ProfileUpdate.new_phone), F.text.regexp(r'^\+?[\d\s]{10,15}$'))
+async def change_phone_finish(message: Message, state: FSMContext, user, lang: str):
     if not user: return
-    lang = user[3]
     
     # Check if we are in registration flow
     data = await state.get_data()
     reg_event_id = data.get('reg_event_id')
     
     phone = message.contact.phone_number if message.contact else message.text
-    update_user_phone(message.from_user.id, phone)
-    user = get_user(message.from_user.id) # Refresh data
+    await update_user_phone(message.from_user.id, phone)
     
     await state.clear()
     
     if reg_event_id:
-        await message.answer(STRINGS[lang]["phone_changed"])
-        text = STRINGS[lang]["confirm_reg"].format(name=user[1], phone=user[2])
+        await message.answer(t(lang, "phone_changed"))
+        text = t(lang, "confirm_reg", name=user[1], phone=phone)
         await message.answer(text, reply_markup=kb.get_reg_confirm_keyboard(lang, reg_event_id))
     else:
-        await message.answer(STRINGS[lang]["phone_changed"], reply_markup=kb.get_settings_keyboard(lang))
+        await message.answer(t(lang, "phone_changed"), reply_markup=kb.get_settings_keyboard(lang))
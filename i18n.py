@@ -0,0 +1,72 @@
+"""
+Localized texts.
+
+The catalogs are STRINGS[lang][key] in strings.py. A language is compiled
+on first use into one flat key -> entry map with its fallbacks already
+merged in. An entry is the plain text, or the text's bound str.format
+method when it has placeholders. Rendering is then one dict lookup and at
+most one call.
+
+validate() runs at startup. It refuses to start the bot if a language is
+missing a key, or if a template's placeholders differ between languages,
+so a bad catalog cannot raise a KeyError halfway through a flow.
+
+_load() is the only place that reads a catalog. If catalogs move to files,
+only _load() changes.
+"""
+import string
+
+from strings import STRINGS
+
+DEFAULT_LANG = "ru"
+LANGUAGES = tuple(STRINGS)
+
+# Languages tried in order for a key; unknown languages get DEFAULT_LANG
+FALLBACKS = {lang: (lang, DEFAULT_LANG) for lang in LANGUAGES}
+FALLBACKS[DEFAULT_LANG] = (DEFAULT_LANG,)
+
+_formatter = string.Formatter()
+_compiled = {}  # lang -> {key: text or bound str.format}
+
+def placeholders(text):
+    """Names of the str.format fields in a template"""
+    return frozenset(field.split(".")[0].split("[")[0]
+                     for _, field, _, _ in _formatter.parse(text) if field)
+
+def _load(lang):
+    return STRINGS.get(lang, {})
+
+def _compile(lang):
+    entries = {}
+    # Later (more specific) languages override the fallbacks
+    for source in reversed(FALLBACKS.get(lang, (lang, DEFAULT_LANG))):
+        for key, text in _load(source).items():
+            entries[key] = text.format if placeholders(text) else text
+    return entries
+
+def catalog(lang):
+    """Compiled key -> entry map of a language"""
+    entries = _compiled.get(lang)
+    if entries is None:
+        entries = _compiled[lang] = _compile(lang)
+    return entries
+
+def t(lang, key, **kwargs):
+    """Text for `key` in `lang`, with the placeholders filled from kwargs"""
+    entry = catalog(lang)[key]
+    return entry if entry.__class__ is str else entry(**kwargs)
+
+def validate():
+    """Raise ValueError listing every missing key and placeholder mismatch"""
+    reference = _load(DEFAULT_LANG)
+    problems = []
+    for lang in LANGUAGES:
+        texts = _load(lang)
+        problems += [f"{lang}: missing {key!r}" for key in reference.keys() - texts.keys()]
+        problems += [f"{lang}: unknown {key!r}" for key in texts.keys() - reference.keys()]
+        for key in reference.keys() & texts.keys():
+            expected, found = placeholders(reference[key]), placeholders(texts[key])
+            if expected != found:
+                problems.append(f"{lang}: {key!r} has placeholders {sorted(found)}, expected {sorted(expected)}")
+    if problems:
+        raise ValueError("Invalid string catalog:\n" + "\n".join(sorted(problems)))
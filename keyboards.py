@@ -1,37 +1,84 @@
+import functools
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from strings import STRINGS
+from i18n import LANGUAGES, t
+
+# Menus only vary by language and per-event keyboards only by language and
+# event id, so each one is built once and the same markup object is handed
+# out afterwards. Callers must not modify a returned keyboard.
+_static = {}  # (kind, *args) -> markup
+_per_event = {}  # event_id -> {(kind, lang, *args): markup}
+
+def _static_keyboard(build):
+    @functools.wraps(build)
+    def get(*args):
+        key = (build.__name__,) + args
+        markup = _static.get(key)
+        if markup is None:
+            markup = _static[key] = build(*args)
+        return markup
+    return get
+
+def _event_keyboard(build):
+    @functools.wraps(build)
+    def get(lang, event_id, *args):
+        cache = _per_event.setdefault(event_id, {})
+        key = (build.__name__, lang) + args
+        markup = cache.get(key)
+        if markup is None:
+            markup = cache[key] = build(lang, event_id, *args)
+        return markup
+    return get
+
+def warm_up():
+    """Build every static keyboard up front, called at startup"""
+    get_lang_keyboard()
+    for lang in LANGUAGES:
+        get_phone_keyboard(lang)
+        get_main_menu(lang)
+        get_settings_keyboard(lang)
+        get_admin_menu(lang)
+
+def invalidate_event(event_id):
+    """Drop the cached keyboards of an edited or deleted event"""
+    _per_event.pop(event_id, None)
 
+@_static_keyboard
 def get_lang_keyboard():
     buttons = [
         [KeyboardButton(text="RU"), KeyboardButton(text="UZ"), KeyboardButton(text="EN")]
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
+@_static_keyboard
 def get_phone_keyboard(lang):
     buttons = [
-        [KeyboardButton(text=STRINGS[lang]["share_phone"], request_contact=True)]
+        [KeyboardButton(text=t(lang, "share_phone"), request_contact=True)]
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
+@_static_keyboard
 def get_main_menu(lang):
     buttons = [
-        [KeyboardButton(text=STRINGS[lang]["online_events"]), KeyboardButton(text=STRINGS[lang]["offline_events"])],
-        [KeyboardButton(text=STRINGS[lang]["about_us"]), KeyboardButton(text=STRINGS[lang]["settings"])]
+        [KeyboardButton(text=t(lang, "online_events")), KeyboardButton(text=t(lang, "offline_events"))],
+        [KeyboardButton(text=t(lang, "about_us")), KeyboardButton(text=t(lang, "settings"))]
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
+@_static_keyboard
 def get_settings_keyboard(lang):
     buttons = [
-        [KeyboardButton(text=STRINGS[lang]["change_name"]), KeyboardButton(text=STRINGS[lang]["change_phone"])],
-        [KeyboardButton(text=STRINGS[lang]["change_lang"])],
-        [KeyboardButton(text=STRINGS[lang]["main_menu"])]
+        [KeyboardButton(text=t(lang, "change_name")), KeyboardButton(text=t(lang, "change_phone"))],
+        [KeyboardButton(text=t(lang, "change_lang"))],
+        [KeyboardButton(text=t(lang, "main_menu"))]
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
+@_static_keyboard
 def get_admin_menu(lang):
     buttons = [
-        [KeyboardButton(text=STRINGS[lang]["active_events"]), KeyboardButton(text=STRINGS[lang]["create_cat"])],
-        [KeyboardButton(text=STRINGS[lang]["add_event"]), KeyboardButton(text=STRINGS[lang]["exit_admin"])]
+        [KeyboardButton(text=t(lang, "active_events")), KeyboardButton(text=t(lang, "create_cat"))],
+        [KeyboardButton(text=t(lang, "add_event")), KeyboardButton(text=t(lang, "exit_admin"))]
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
@@ -48,10 +95,18 @@ def get_social_keyboard(links):
         buttons.append([InlineKeyboardButton(text=platform.capitalize(), url=url)])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-def get_event_reg_keyboard(lang, event_id):
+@_event_keyboard
+def get_event_card_keyboard(lang, event_id, has_prev, has_next):
     buttons = [
-        [InlineKeyboardButton(text=STRINGS[lang]["register"], callback_data=f"reg_{event_id}")]
+        [InlineKeyboardButton(text=t(lang, "register"), callback_data=f"reg_{event_id}")]
     ]
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton(text="◀️", callback_data=f"events_prev_{event_id}"))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="▶️", callback_data=f"events_next_{event_id}"))
+    if nav:
+        buttons.append(nav)
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 def get_moder_events_keyboard(events):
@@ -63,55 +118,66 @@ def get_moder_events_keyboard(events):
         buttons.append([InlineKeyboardButton(text=short_desc, callback_data=f"moder_event_{ev_id}")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@_event_keyboard
 def get_reg_confirm_keyboard(lang, event_id):
     buttons = [
-        [InlineKeyboardButton(text=STRINGS[lang]["confirm_btn"], callback_data=f"confirm_reg_{event_id}")],
-        [InlineKeyboardButton(text=STRINGS[lang]["edit_name_btn"], callback_data=f"edit_reg_name_{event_id}")],
-        [InlineKeyboardButton(text=STRINGS[lang]["edit_phone_btn"], callback_data=f"edit_reg_phone_{event_id}")]
+        [InlineKeyboardButton(text=t(lang, "confirm_btn"), callback_data=f"confirm_reg_{event_id}")],
+        [InlineKeyboardButton(text=t(lang, "edit_name_btn"), callback_data=f"edit_reg_name_{event_id}")],
+        [InlineKeyboardButton(text=t(lang, "edit_phone_btn"), callback_data=f"edit_reg_phone_{event_id}")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-def get_admin_events_keyboard(events):
-    """Inline keyboard list of events for admin"""
+def get_admin_events_keyboard(events, has_prev=False, has_next=False):
+    """Inline keyboard with one page of events for admin"""
     buttons = []
     for ev_id, cat, desc in events:
         # Format: [Category] Description...
         btn_text = f"[{cat}] {desc[:20]}..."
         buttons.append([InlineKeyboardButton(text=btn_text, callback_data=f"admin_event_{ev_id}")])
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton(text="◀️", callback_data=f"admin_page_prev_{events[0][0]}"))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="▶️", callback_data=f"admin_page_next_{events[-1][0]}"))
+    if nav:
+        buttons.append(nav)
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@_event_keyboard
 def get_event_manage_keyboard(lang, event_id):
     buttons = [
-        [InlineKeyboardButton(text=STRINGS[lang]["edit_event"], callback_data=f"admin_edit_{event_id}")],
-        [InlineKeyboardButton(text=STRINGS[lang]["delete_event_btn"], callback_data=f"admin_del_ask_{event_id}")],
-        [InlineKeyboardButton(text=STRINGS[lang]["back_btn"], callback_data="admin_back_list")]
+        [InlineKeyboardButton(text=t(lang, "edit_event"), callback_data=f"admin_edit_{event_id}")],
+        [InlineKeyboardButton(text=t(lang, "delete_event_btn"), callback_data=f"admin_del_ask_{event_id}")],
+        [InlineKeyboardButton(text=t(lang, "back_btn"), callback_data="admin_back_list")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@_event_keyboard
 def get_delete_confirm_keyboard(lang, event_id):
     buttons = [
-        [InlineKeyboardButton(text=STRINGS[lang]["confirm_delete_btn"], callback_data=f"admin_del_confirm_{event_id}")],
-        [InlineKeyboardButton(text=STRINGS[lang]["back_btn"], callback_data=f"admin_event_{event_id}")]
+        [InlineKeyboardButton(text=t(lang, "confirm_delete_btn"), callback_data=f"admin_del_confirm_{event_id}")],
+        [InlineKeyboardButton(text=t(lang, "back_btn"), callback_data=f"admin_event_{event_id}")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+@_event_keyboard
 def get_event_edit_keyboard(lang, event_id, is_offline=False):
     buttons = [
-        [InlineKeyboardButton(text=STRINGS[lang]["edit_img"], callback_data=f"edit_field_img_{event_id}")],
-        [InlineKeyboardButton(text=STRINGS[lang]["edit_desc"], callback_data=f"edit_field_desc_{event_id}")],
-        [InlineKeyboardButton(text=STRINGS[lang]["edit_time"], callback_data=f"edit_field_time_{event_id}")],
-        [InlineKeyboardButton(text=STRINGS[lang]["edit_date"], callback_data=f"edit_field_date_{event_id}")],
-        [InlineKeyboardButton(text=STRINGS[lang]["edit_capacity"], callback_data=f"edit_field_cap_{event_id}")]
+        [InlineKeyboardButton(text=t(lang, "edit_img"), callback_data=f"edit_field_img_{event_id}")],
+        [InlineKeyboardButton(text=t(lang, "edit_desc"), callback_data=f"edit_field_desc_{event_id}")],
+        [InlineKeyboardButton(text=t(lang, "edit_time"), callback_data=f"edit_field_time_{event_id}")],
+        [InlineKeyboardButton(text=t(lang, "edit_date"), callback_data=f"edit_field_date_{event_id}")],
+        [InlineKeyboardButton(text=t(lang, "edit_capacity"), callback_data=f"edit_field_cap_{event_id}")]
     ]
     if is_offline:
-        buttons.append([InlineKeyboardButton(text=STRINGS[lang]["edit_location"], callback_data=f"edit_field_loc_{event_id}")])
+        buttons.append([InlineKeyboardButton(text=t(lang, "edit_location"), callback_data=f"edit_field_loc_{event_id}")])
     
-    buttons.append([InlineKeyboardButton(text=STRINGS[lang]["back_btn"], callback_data=f"admin_event_{event_id}")])
+    buttons.append([InlineKeyboardButton(text=t(lang, "back_btn"), callback_data=f"admin_event_{event_id}")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 def get_back_keyboard(lang, callback_data):
     buttons = [
-        [InlineKeyboardButton(text=STRINGS[lang]["back_btn"], callback_data=callback_data)]
+        [InlineKeyboardButton(text=t(lang, "back_btn"), callback_data=callback_data)]
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
  
\ No newline at end of file
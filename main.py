@@ -1,36 +1,132 @@
 import asyncio
 import logging
 import sys
+from functools import partial
 
 from aiogram import Bot, Dispatcher
-from config import BOT_TOKEN
-from database import init_db
+from config import BOT_TOKEN, BOT_MODE, BOT_WORKERS, METRICS_PORT, WEBHOOK_SECRET, WEBHOOK_URL
+from async_database import init_db, shutdown as shutdown_db
 from handlers import user_handlers, admin_handlers, moder_handlers
+from middlewares import (BotApiTimingMiddleware, HandlerTimingMiddleware,
+                         LanguageMiddleware, ThrottlingMiddleware)
+from fsm_storage import create_storage
+import broadcast
+import cluster
+import i18n
+import keyboards as kb
+import metrics
+import google_sheets
+import sheets_export
+import sheets_sync
+import webhook
 
-async def main():
-    if not BOT_TOKEN or BOT_TOKEN == "your_telegram_bot_token_here":
-        print("Error: BOT_TOKEN not set in .env")
-        return
+def create_dispatcher(throttle=True):
+    """The bot's dispatcher; benchmarks replaying many updates per user pass throttle=False"""
+    dp = Dispatcher(storage=create_storage())
 
-    # Initialize database
-    init_db()
+    if throttle:
+        # Drop floods and repeated button presses before anything else runs.
+        # Logged-in staff work in bursts (a moderator checking in a queue at the door)
+        staff_states = {state.state for group in (admin_handlers.AdminState, moder_handlers.ModeratorState)
+                        for state in group.__all_states__}
+        staff_states -= {admin_handlers.AdminState.password.state, moder_handlers.ModeratorState.password.state}
+        throttling = ThrottlingMiddleware(exempt_states=staff_states)
+        dp.update.outer_middleware(throttling)
+        metrics.Counter("bot_throttle_updates_total", "Updates seen by the flood control, by outcome", ("outcome",),
+                        collect=lambda: {(outcome,): throttling.stats()[outcome]
+                                         for outcome in ("passed", "throttled", "coalesced")})
+        metrics.Gauge("bot_throttle_users", "Users tracked by the flood control",
+                      collect=lambda: {(): throttling.stats()["users"]})
 
-    bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher()
+    # Resolve user and language once per update
+    dp.update.outer_middleware(LanguageMiddleware())
 
     # Register routers
     dp.include_router(admin_handlers.router)
     dp.include_router(moder_handlers.router)
     dp.include_router(user_handlers.router)
 
-    # Start polling
-    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    # Time every handler; inner middlewares of the dispatcher apply to nested routers
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(HandlerTimingMiddleware())
+    return dp
+
+async def poll(dp, bot):
+    # getUpdates is refused while a webhook is set
+    await bot.delete_webhook()
     await dp.start_polling(bot)
 
+async def run(serve, background=True, metrics_port=METRICS_PORT):
+    """Set up the database and the bot, then handle updates with `serve(dp, bot)`"""
+    # Fail fast on a broken string catalog
+    i18n.validate()
+
+    # Initialize database
+    await init_db()
+    kb.warm_up()
+
+    bot = Bot(token=BOT_TOKEN)
+    bot.session.middleware(BotApiTimingMiddleware())
+    dp = create_dispatcher()
+    metrics_server = await metrics.start_server(metrics_port)
+
+    workers = []
+    if background:
+        # Deliver queued broadcasts, including ones interrupted by a restart
+        workers.append(broadcast.start_worker(bot))
+
+        # Export new registrations to Google Sheets in batches
+        if google_sheets.is_configured():
+            workers.append(sheets_export.start_worker())
+            workers.append(sheets_sync.start_worker(bot))
+
+    try:
+        await serve(dp, bot)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        if metrics_server:
+            await metrics_server.cleanup()
+        await dp.storage.close()
+        shutdown_db()
+
+def run_worker(index):
+    """Entry point of worker process `index` when BOT_WORKERS > 1"""
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format=f"[worker {index}] %(levelname)s:%(name)s:%(message)s")
+    try:
+        # Background jobs are shared through the database; one worker runs them
+        asyncio.run(run(partial(cluster.serve_worker, index), background=index == 0,
+                        metrics_port=METRICS_PORT and METRICS_PORT + 1 + index))
+    except KeyboardInterrupt:
+        pass
+
+async def main():
+    if not BOT_TOKEN or BOT_TOKEN == "your_telegram_bot_token_here":
+        print("Error: BOT_TOKEN not set in .env")
+        return
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        print("Error: WEBHOOK_URL not set in .env (required with BOT_MODE=webhook)")
+        return
+    if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+        # Anyone who finds the URL could post forged updates otherwise
+        print("Error: WEBHOOK_SECRET not set in .env (required with BOT_MODE=webhook)")
+        return
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    if BOT_MODE == "webhook" and BOT_WORKERS > 1:
+        # This process only forwards updates to the workers
+        allowed_updates = create_dispatcher().resolve_used_update_types()
+        await cluster.run_front(Bot(token=BOT_TOKEN), allowed_updates, run_worker)
+    elif BOT_MODE == "webhook":
+        await run(webhook.run)
+    else:
+        await run(poll)
+
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         print("Bot stopped")
- 
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+In-process metrics, exported in the Prometheus text format.
+
+Modules declare their metrics at import time:
+- Counter: things that only go up.
+- Gauge: current values.
+- Histogram: latencies, in seconds.
+
+Label values are passed positionally, in the order the labels were
+declared. A metric created with `collect` does not store anything; its
+samples are read from the callable, e.g. an existing stats() method,
+every time /metrics is scraped.
+
+What is measured:
+- bot_handler_seconds (middlewares.HandlerTimingMiddleware): every
+  handler, by router and handler name.
+- bot_db_seconds (async_database): every database call, including the
+  wait for the database thread.
+- bot_api_seconds (middlewares.BotApiTimingMiddleware): every Bot API
+  request, by method.
+- bot_sheets_seconds (google_sheets): Sheets writes.
+
+start_server() serves GET /metrics on METRICS_HOST:METRICS_PORT. It binds
+to localhost by default. Every process of a cluster has its own port.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from aiohttp import web
+
+from config import METRICS_HOST
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = {}  # name -> metric, in registration order
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect  # () -> {label values: value}
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()  # Sheets calls observe from worker threads
+        _registry[name] = self
+
+    def samples(self):
+        if self.collect:
+            values = self.collect()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for labels, value in values.items():
+            yield self.name + _format_labels(self.labels, labels), value
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # Per-bucket (not cumulative) counts, the last one is +Inf; then the sum
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        names = self.labels + ("le",)
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield self.name + "_bucket" + _format_labels(names, labels + (_format_value(bound),)), cumulative
+            yield self.name + "_sum" + _format_labels(self.labels, labels), total
+            yield self.name + "_count" + _format_labels(self.labels, labels), cumulative
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in list(_registry.values()):
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{series} {_format_value(value)}" for series, value in metric.samples())
+    return "\n".join(lines) + "\n"
+
+async def handle_metrics(request):
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8",
+                        headers={"Cache-Control": "no-store"})
+
+async def start_server(port, host=METRICS_HOST):
+    """Serve GET /metrics; returns the runner to clean up, or None when port is 0"""
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,154 @@
+import time
+from collections import OrderedDict
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from async_database import get_user
+from config import CALLBACK_DEDUP_WINDOW, THROTTLE_BURST, THROTTLE_MAX_USERS, THROTTLE_RATE
+from i18n import t
+from rate_limit import TokenBucket
+import metrics
+
+DEFAULT_LANG = "ru"
+
+class _UserLimit:
+    __slots__ = ("bucket", "callback", "callback_at", "warned_at")
+
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.callback = None  # (message_id, data) of the last button press let through
+        self.callback_at = 0.0
+        self.warned_at = None  # when the user was last told to slow down
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Drops updates from users who flood the bot, before any database work.
+
+    A button pressed again within `window` seconds of the same press is
+    coalesced into the first one. Other updates spend a token from the
+    user's bucket and are dropped when it is empty. Dropped button presses
+    are answered right away so the client stops its spinner; a dropped
+    message gets a "slow down" reply, at most once per `notice_interval`
+    seconds, so typed input is not lost silently. Users in one of
+    `exempt_states` (FSM states of logged-in staff, e.g. a moderator
+    pasting phones at the door) skip the bucket. Users are kept in an LRU
+    of `max_users`; an idle user's bucket refills to full anyway, so
+    forgetting it loses nothing.
+    """
+
+    def __init__(self, rate=THROTTLE_RATE, burst=THROTTLE_BURST,
+                 window=CALLBACK_DEDUP_WINDOW, max_users=THROTTLE_MAX_USERS,
+                 exempt_states=(), notice_interval=10):
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self.max_users = max_users
+        self.exempt_states = frozenset(exempt_states)
+        self.notice_interval = notice_interval
+        self.passed = 0
+        self.throttled = 0
+        self.coalesced = 0
+        self._users = OrderedDict()  # user_id -> _UserLimit, least recently active first
+
+    def _limit(self, user_id):
+        limit = self._users.get(user_id)
+        if limit is None:
+            limit = self._users[user_id] = _UserLimit(self.rate, self.burst)
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return limit
+
+    async def __call__(self, handler, event, data):
+        from_user = data.get("event_from_user")
+        if from_user is None:
+            return await handler(event, data)
+        limit = self._limit(from_user.id)
+        callback = event.callback_query
+
+        if callback is not None:
+            now = time.monotonic()
+            press = (callback.message.message_id if callback.message else None, callback.data)
+            if press == limit.callback and now - limit.callback_at < self.window:
+                self.coalesced += 1
+                await callback.answer()
+                return None
+
+        # The FSM middleware has already read the state
+        if data.get("raw_state") not in self.exempt_states and not limit.bucket.try_acquire():
+            self.throttled += 1
+            if callback is not None:
+                await callback.answer()
+            elif event.message is not None:
+                await self._warn(limit, event.message, from_user.id)
+            return None
+
+        if callback is not None:
+            limit.callback, limit.callback_at = press, now
+        self.passed += 1
+        return await handler(event, data)
+
+    async def _warn(self, limit, message, user_id):
+        now = time.monotonic()
+        if limit.warned_at is not None and now - limit.warned_at < self.notice_interval:
+            return
+        limit.warned_at = now
+        user = await get_user(user_id)
+        await message.answer(t(user[3] if user else DEFAULT_LANG, "slow_down"))
+
+    def stats(self):
+        return {"users": len(self._users), "max_users": self.max_users, "passed": self.passed,
+                "throttled": self.throttled, "coalesced": self.coalesced}
+
+class LanguageMiddleware(BaseMiddleware):
+    """
+    Resolves the user record and language once per update and passes them
+    to handlers as the `user` and `lang` keyword arguments.
+    """
+
+    async def __call__(self, handler, event, data):
+        from_user = data.get("event_from_user")
+        user = await get_user(from_user.id) if from_user else None
+        data["user"] = user
+        data["lang"] = user[3] if user else DEFAULT_LANG
+        return await handler(event, data)
+
+HANDLER_SECONDS = metrics.Histogram("bot_handler_seconds", "Handler run time", ("router", "handler"))
+HANDLER_ERRORS = metrics.Counter("bot_handler_errors_total", "Handlers that raised", ("router", "handler", "error"))
+API_SECONDS = metrics.Histogram("bot_api_seconds", "Bot API requests", ("method",))
+API_ERRORS = metrics.Counter("bot_api_errors_total", "Failed Bot API requests", ("method", "error"))
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """
+    Inner middleware timing the handler that matched, labelled by router
+    name and handler function. Register it on every event observer of the
+    dispatcher; aiogram applies it to the handlers of nested routers too.
+    """
+
+    async def __call__(self, handler, event, data):
+        router = data["event_router"].name
+        name = data["handler"].callback.__name__
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(router, name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - start, router, name)
+
+class BotApiTimingMiddleware(BaseRequestMiddleware):
+    """Session middleware timing every Bot API request by method"""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            API_SECONDS.observe(time.perf_counter() - start, name)
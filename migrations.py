@@ -0,0 +1,188 @@
+"""
+Versioned schema migrations.
+
+init_db() creates the baseline tables; every schema change after that is a
+numbered migration below. Migrations run once, in order, at startup, each in
+its own transaction, and the applied versions are recorded in schema_version.
+To change the schema, append a new function to MIGRATIONS - never edit one
+that has already shipped.
+"""
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+def _registration_indexes(conn):
+    """Unique (user_id, event_id) and event_id indexes on registrations"""
+    # The old check-then-insert flow could leave duplicate sign-ups behind
+    conn.execute('''
+        DELETE FROM registrations
+        WHERE id NOT IN (SELECT MIN(id) FROM registrations GROUP BY user_id, event_id)
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_registrations_user_event ON registrations (user_id, event_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_registrations_event ON registrations (event_id)")
+
+def _event_registered_count(conn):
+    """Trigger-maintained registered_count column on events"""
+    conn.execute("ALTER TABLE events ADD COLUMN registered_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute('''
+        UPDATE events
+        SET registered_count = (SELECT COUNT(*) FROM registrations r WHERE r.event_id = events.id)
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_registrations_insert AFTER INSERT ON registrations
+        BEGIN
+            UPDATE events SET registered_count = registered_count + 1 WHERE id = NEW.event_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_registrations_delete AFTER DELETE ON registrations
+        BEGIN
+            UPDATE events SET registered_count = registered_count - 1 WHERE id = OLD.event_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_registrations_move AFTER UPDATE OF event_id ON registrations
+        BEGIN
+            UPDATE events SET registered_count = registered_count - 1 WHERE id = OLD.event_id;
+            UPDATE events SET registered_count = registered_count + 1 WHERE id = NEW.event_id;
+        END
+    ''')
+
+def _sheet_exports(conn):
+    """Local queue of registrations waiting to be exported to Google Sheets"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sheet_exports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER,
+            full_name TEXT,
+            phone TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _normalize_phone_v4(phone):
+    # Frozen copy of phones.normalize_phone as migration 4 shipped it, so
+    # later changes to the live function do not change this migration
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) == 9:
+        digits = "998" + digits
+    return digits
+
+def _normalized_phones(conn):
+    """Indexed normalized (and reversed, for suffix search) phone columns on users"""
+    conn.execute("ALTER TABLE users ADD COLUMN phone_normalized TEXT")
+    conn.execute("ALTER TABLE users ADD COLUMN phone_reversed TEXT")
+    rows = conn.execute("SELECT user_id, phone FROM users").fetchall()
+    updates = []
+    for user_id, phone in rows:
+        digits = _normalize_phone_v4(phone)
+        updates.append((digits, digits[::-1], user_id))
+    conn.executemany("UPDATE users SET phone_normalized = ?, phone_reversed = ? WHERE user_id = ?", updates)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_phone_normalized ON users (phone_normalized)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_phone_reversed ON users (phone_reversed)")
+
+def _registration_attendance(conn):
+    """attended_at timestamp on registrations, set at check-in"""
+    conn.execute("ALTER TABLE registrations ADD COLUMN attended_at TEXT")
+
+def _event_category_index(conn):
+    """category_id index on events for the per-category carousel"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_category ON events (category_id)")
+
+def _fsm_states(conn):
+    """Persistent FSM states (fsm_storage.SQLiteStorage)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT NOT NULL DEFAULT '{}',
+            updated_at REAL NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states (updated_at)")
+
+def _sheet_sync_requests(conn):
+    """Full Sheets syncs requested from the admin menu, run by the background worker"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sheet_sync_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_chat_id INTEGER,
+            admin_lang TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _roster_version(conn):
+    """
+    Counter bumped by triggers whenever a check-in index could go stale: a
+    participant's name or phone changes, a registration or an event is
+    deleted. Every process compares it with the version its indexes were
+    built from.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS roster_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO roster_version (id, version) VALUES (1, 0)")
+    bump = "UPDATE roster_version SET version = version + 1 WHERE id = 1;"
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_roster_user_update AFTER UPDATE OF phone, full_name ON users
+        WHEN OLD.phone IS NOT NEW.phone OR OLD.full_name IS NOT NEW.full_name
+        BEGIN {bump} END
+    ''')
+    # add_user re-registers with INSERT OR REPLACE, which fires no update trigger
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_roster_user_replace BEFORE INSERT ON users
+        WHEN EXISTS (SELECT 1 FROM users WHERE user_id = NEW.user_id
+                     AND (phone IS NOT NEW.phone OR full_name IS NOT NEW.full_name))
+        BEGIN {bump} END
+    ''')
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_roster_registration_delete AFTER DELETE ON registrations BEGIN {bump} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_roster_event_delete AFTER DELETE ON events BEGIN {bump} END")
+
+MIGRATIONS = [
+    (1, _registration_indexes),
+    (2, _event_registered_count),
+    (3, _sheet_exports),
+    (4, _normalized_phones),
+    (5, _registration_attendance),
+    (6, _event_category_index),
+    (7, _fsm_states),
+    (8, _sheet_sync_requests),
+    (9, _roster_version),
+]
+
+def get_schema_version(conn):
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def migrate(conn):
+    """Apply all pending migrations to an open connection"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT,
+        applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.commit()
+
+    for version, migration in MIGRATIONS:
+        # IMMEDIATE takes the write lock up front, so two processes starting
+        # at once cannot both apply the same migration
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            logger.info("Applying migration %s: %s", version, migration.__doc__)
+            migration(conn)
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                         (version, migration.__name__.lstrip("_")))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
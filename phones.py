@@ -0,0 +1,14 @@
+import re
+
+COUNTRY_CODE = "998"
+LOCAL_LENGTH = 9  # Uzbek numbers without the country code
+
+def normalize_phone(phone):
+    """
+    Digits-only, E.164-like form used for lookups: "+998 (90) 123-45-67",
+    "998901234567" and "901234567" all become "998901234567".
+    """
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) == LOCAL_LENGTH:
+        digits = COUNTRY_CODE + digits
+    return digits
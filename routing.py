@@ -0,0 +1,67 @@
+"""
+Menu button routing.
+
+Reply-keyboard buttons arrive as plain text messages carrying the button
+label. ROUTES maps every label of every language in the catalog to its
+(key, lang), built once at import, so matching a message is one dict
+lookup and adding a language needs no handler changes.
+"""
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery, Message
+
+import i18n
+
+# Catalog keys that are used as reply-keyboard button labels
+BUTTON_KEYS = (
+    "online_events", "offline_events", "about_us", "settings", "main_menu",
+    "change_lang", "change_name", "change_phone",
+    "active_events", "create_cat", "add_event", "exit_admin",
+)
+
+# The language keyboard is not localized
+LANGUAGE_BUTTONS = {"RU": "ru", "UZ": "uz", "EN": "en"}
+
+def build_routes(languages, keys):
+    """label -> (key, lang); raises if one label would mean two different buttons"""
+    routes = {label: ("language", lang) for label, lang in LANGUAGE_BUTTONS.items()}
+    for lang in languages:
+        for key in keys:
+            label = i18n.t(lang, key)
+            if label in routes and routes[label][0] != key:
+                raise ValueError(f"Button label {label!r} is used for both {routes[label][0]} and {key}")
+            routes.setdefault(label, (key, lang))
+    return routes
+
+ROUTES = build_routes(i18n.LANGUAGES, BUTTON_KEYS)
+
+def resolve(text):
+    """(key, lang) of the button with this label, or None"""
+    return ROUTES.get(text)
+
+class Button(Filter):
+    """
+    Matches a press of any of the given buttons, in any language, and
+    passes `button` (the key) and `button_lang` to the handler.
+    """
+
+    def __init__(self, *keys):
+        self.keys = frozenset(keys)
+
+    async def __call__(self, message: Message):
+        route = ROUTES.get(message.text)
+        if route is None or route[0] not in self.keys:
+            return False
+        return {"button": route[0], "button_lang": route[1]}
+
+class CallbackPrefix(Filter):
+    """
+    Async equivalent of F.data.startswith(prefix). aiogram runs synchronous
+    filters (magic filters and bare State objects) in a thread pool, one
+    hop per handler it tries, which dominated dispatch time.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    async def __call__(self, callback: CallbackQuery):
+        return callback.data is not None and callback.data.startswith(self.prefix)
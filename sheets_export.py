@@ -0,0 +1,87 @@
+"""
+Background export of registrations to Google Sheets.
+
+Registrations are queued in the local sheet_exports table and a worker
+flushes them every FLUSH_INTERVAL seconds (or sooner once FLUSH_SIZE rows
+are waiting), writing each event's rows with a single append_rows call.
+"""
+import asyncio
+import logging
+
+import google_sheets
+from async_database import (delete_sheet_exports, enqueue_sheet_export,
+                            get_event_by_id, get_pending_sheet_exports)
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 10  # seconds
+FLUSH_SIZE = 50  # queued rows that trigger an early flush
+MAX_BATCH = 500  # rows read from the queue per pass
+BASE_BACKOFF = 5
+MAX_BACKOFF = 300
+
+_flush_now = asyncio.Event()
+_queued = 0
+
+# Held while writing to the sheets; a full sync takes it to pause exports
+lock = asyncio.Lock()
+
+async def enqueue_registration(event_id, full_name, phone):
+    global _queued
+    if not google_sheets.is_configured():
+        return
+    await enqueue_sheet_export(event_id, full_name, phone)
+    _queued += 1
+    if _queued >= FLUSH_SIZE:
+        _flush_now.set()
+
+async def flush():
+    """Export everything queued so far; raises if the Sheets API fails"""
+    global _queued
+    session = google_sheets.get_session()
+    while True:
+        _queued = 0
+        pending = await get_pending_sheet_exports(MAX_BATCH)
+        if not pending:
+            return
+
+        by_event = {}
+        for export_id, event_id, full_name, phone in pending:
+            by_event.setdefault(event_id, []).append((export_id, [full_name, phone]))
+
+        for event_id, items in by_event.items():
+            event = await get_event_by_id(event_id)
+            # Rows of deleted events are dropped
+            if event:
+                rows = [row for _, row in items]
+                await asyncio.to_thread(session.append_rows, event_id, event[2], rows)
+            await delete_sheet_exports([export_id for export_id, _ in items])
+
+        if len(pending) < MAX_BATCH:
+            return
+
+def start_worker():
+    return asyncio.create_task(run_worker())
+
+async def run_worker():
+    backoff = 0
+    while True:
+        if backoff:
+            await asyncio.sleep(backoff)
+        else:
+            try:
+                await asyncio.wait_for(_flush_now.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        _flush_now.clear()
+
+        try:
+            async with lock:
+                await flush()
+            backoff = 0
+        except Exception as e:
+            backoff = min(MAX_BACKOFF, backoff * 2 if backoff else BASE_BACKOFF)
+            if google_sheets.is_quota_error(e):
+                logger.warning("Sheets quota exceeded, retrying in %s s", backoff)
+            else:
+                logger.exception("Sheets export failed, retrying in %s s", backoff)
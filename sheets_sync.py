@@ -0,0 +1,131 @@
+"""
+Full reconcile of Google Sheets against the registrations table.
+
+The database is the source of truth: every event's worksheet is diffed
+against its registrations and only the changed tail is rewritten, with one
+write per sheet. Events are walked page by page so only one event's rows
+are held in memory at a time.
+
+/sync_sheets in the admin menu queues a request; the background worker
+(next to the export worker, so the two never write at once) runs it,
+backing off on API errors, and reports back to the admin. Run
+`python sheets_sync.py` only while the bot is stopped.
+"""
+import asyncio
+import logging
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+import google_sheets
+import sheets_export
+from async_database import (delete_event_sheet_exports, get_event_sheet_snapshot,
+                            get_events_after, get_next_sheet_sync,
+                            request_sheet_sync, set_sheet_sync_status)
+from i18n import t
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PAGE_SIZE = 50
+MAX_ATTEMPTS = 5  # failed runs of one request before it is given up
+POLL_INTERVAL = 5  # seconds between request checks while idle
+
+_wakeup = asyncio.Event()
+
+async def sync_all():
+    """Returns {"events", "added", "removed", "calls"}"""
+    session = google_sheets.get_session()
+    report = {"events": 0, "added": 0, "removed": 0, "calls": 0}
+    calls_before = session.calls
+
+    # Hold off the export worker. Each event's queued rows up to the
+    # snapshot are already in its registrations and are dropped once the
+    # event is written; rows queued later are exported as usual
+    async with sheets_export.lock:
+        last_id = 0
+        while True:
+            events = await get_events_after(last_id, EVENTS_PAGE_SIZE)
+            if not events:
+                break
+            for event_id, description in events:
+                registrations, high_water = await get_event_sheet_snapshot(event_id)
+                rows = [list(row) for row in registrations]
+                added, removed = await asyncio.to_thread(session.reconcile, event_id, description, rows)
+                await delete_event_sheet_exports(event_id, high_water)
+                report["events"] += 1
+                report["added"] += added
+                report["removed"] += removed
+            last_id = events[-1][0]
+
+    report["calls"] = session.calls - calls_before
+    logger.info("Sheets sync finished: %s", report)
+    return report
+
+async def request_sync(admin_chat_id, admin_lang):
+    """Queue a sync for the worker; False if one is already queued or running"""
+    request_id = await request_sheet_sync(admin_chat_id, admin_lang)
+    _wakeup.set()
+    return request_id is not None
+
+def start_worker(bot):
+    return asyncio.create_task(run_worker(bot))
+
+async def run_worker(bot):
+    """Run queued sync requests, including one interrupted by a restart"""
+    failures = 0
+    while True:
+        request = await get_next_sheet_sync()
+        if request is None:
+            # Requests queued by other worker processes only show up in the database
+            try:
+                await asyncio.wait_for(_wakeup.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+
+        request_id, admin_chat_id, admin_lang, status = request
+        if status == "pending":
+            await set_sheet_sync_status(request_id, "running")
+        try:
+            report = await sync_all()
+        except Exception as e:
+            failures += 1
+            if failures >= MAX_ATTEMPTS:
+                logger.exception("Sheets sync %s failed %s times, giving up", request_id, failures)
+                await set_sheet_sync_status(request_id, "failed")
+                await _notify_admin(bot, admin_chat_id, t(admin_lang, "sheets_sync_failed"))
+                failures = 0
+                continue
+            backoff = min(sheets_export.MAX_BACKOFF, sheets_export.BASE_BACKOFF * 2 ** failures)
+            if google_sheets.is_quota_error(e):
+                logger.warning("Sheets quota exceeded during sync, retrying in %s s", backoff)
+            else:
+                logger.exception("Sheets sync failed, retrying in %s s", backoff)
+            await asyncio.sleep(backoff)
+            continue
+
+        failures = 0
+        await set_sheet_sync_status(request_id, "done")
+        await _notify_admin(bot, admin_chat_id, t(admin_lang, "sheets_sync_done", **report))
+
+async def _notify_admin(bot, chat_id, text):
+    # Best effort: an admin who blocked the bot must not stall the worker
+    try:
+        await bot.send_message(chat_id, text)
+    except (TelegramForbiddenError, TelegramBadRequest) as e:
+        logger.info("Sheets sync report for admin %s not delivered: %s", chat_id, e)
+
+async def _main():
+    from async_database import init_db, shutdown
+    logging.basicConfig(level=logging.INFO)
+    if not google_sheets.is_configured():
+        print("Google Sheets credentials not found.")
+        return
+    await init_db()
+    try:
+        print(await sync_all())
+    finally:
+        shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(_main())
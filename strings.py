@@ -36,6 +36,7 @@ STRINGS = {
         "phone_changed": "Номер успешно изменен!",
         "register": "Записаться ✅",
         "reg_success": "Вы успешно записались на ивент!",
+        "ticket_code": "🎟 Ваш билет: {code}\nПокажите его модератору на входе.",
         "already_reg": "Вы уже записаны на этот ивент.",
         "confirm_reg": "Ваши данные для регистрации:\n\n👤 ФИО: {name}\n📞 Телефон: {phone}\n\nДанные верны ?",
         "confirm_btn": "Да, записаться ✅",
@@ -57,7 +58,40 @@ STRINGS = {
         "edit_capacity": "Изменить кол-во мест",
         "edit_location": "Изменить локацию",
         "event_updated": "Ивент обновлен!",
-        "enter_new_val": "Введите новое значение:"
+        "enter_new_val": "Введите новое значение:",
+        "broadcast_started": "📣 Рассылка запущена: {total} получателей.",
+        "broadcast_progress": "📣 Рассылка: {done}/{total}",
+        "counts_repaired": "Счётчики мест пересчитаны. Исправлено ивентов: {count}",
+        "sheets_sync_queued": "Синхронизация с Google Sheets запущена. Я пришлю отчёт, когда она закончится.",
+        "sheets_sync_running": "Синхронизация с Google Sheets уже идёт.",
+        "sheets_sync_failed": "Синхронизация с Google Sheets не удалась. Подробности в логах бота.",
+        "sheets_sync_done": "Синхронизация с Google Sheets завершена.\n\nИвентов: {events}\nДобавлено строк: {added}\nУдалено строк: {removed}\nЗапросов к API: {calls}",
+        "sheets_not_configured": "Google Sheets не настроен.",
+        "broadcast_done": "📣 Рассылка завершена.\n\n✅ Доставлено: {sent}\n🚫 Заблокировали бота: {blocked}\n❌ Ошибки: {failed}",
+        "spots": "👥 Мест: {available}/{total}",
+        "spots_unlimited": "👥 Мест: ∞",
+        "location_label": "📍 Локация",
+        "no_spots": "❌ Мест нет",
+        "slow_down": "Слишком много сообщений подряд, часть из них пропущена. Подождите пару секунд и отправьте их ещё раз.",
+        "event_not_found": "Ивент не найден",
+        "capacity_invalid": "Пожалуйста, введите число (0 или больше)",
+        "photo_required": "Пожалуйста, отправьте фото.",
+        "cat_save_failed": "Не удалось сохранить категорию: ошибка или такая категория уже есть.",
+        "use_buttons": "Пожалуйста, выберите вариант на кнопках.",
+        "choose_language": "Please choose a language / Пожалуйста, выберите язык / Tilni tanlang:",
+        "choose_language_buttons": "Please use the buttons / Пожалуйста, используйте кнопки / Iltimos, tugmalardan foydalaning",
+        "moder_password": "Введите пароль модератора:",
+        "moder_no_events": "Нет доступных ивентов",
+        "moder_online_events": "📱 Онлайн ивенты:",
+        "moder_offline_events": "📍 Оффлайн ивенты:",
+        "checkin_prompt": "Введите номер телефона или код билета (можно несколько, каждый с новой строки):",
+        "checkin_counter": "Отмечено: {attended} / {registered}",
+        "checkin_ok": "✅ {name} ({phone})",
+        "checkin_already": "☑️ {name} ({phone}) — уже отмечен",
+        "checkin_invalid_ticket": "⛔️ {code} — недействительный билет",
+        "checkin_wrong_event": "⛔️ {code} — билет на другой ивент",
+        "checkin_not_found": "❌ {phone} — не найден",
+        "checkin_next": "Введите следующий номер для проверки"
     },
     "uz": {
         "welcome": "Xush kelibsiz! Iltimos, tilni tanlang:",
@@ -96,6 +130,7 @@ STRINGS = {
         "phone_changed": "Raqam muvaffaqiyatli o'zgartirildi!",
         "register": "Ro'yxatdan o'tish ✅",
         "reg_success": "Siz muvaffaqiyatli ro'yxatdan o'tdingiz!",
+        "ticket_code": "🎟 Chiptangiz: {code}\nKirishda uni moderatorga ko'rsating.",
         "already_reg": "Siz allaqachon ro'yxatdan o'tgansiz.",
         "confirm_reg": "Ro'yxatdan o'tish ma'lumotlaringiz:\n\n👤 FIO: {name}\n📞 Tel: {phone}\n\nMa'lumot to'g'rimi?",
         "confirm_btn": "Ha, ro'yxatdan o'tish ✅",
@@ -117,7 +152,40 @@ STRINGS = {
         "edit_capacity": "Joylar sonini o'zgartirish",
         "edit_location": "Joylashuvni o'zgartirish",
         "event_updated": "Tadbir yangilandi!",
-        "enter_new_val": "Yangi qiymatni kiriting:"
+        "enter_new_val": "Yangi qiymatni kiriting:",
+        "broadcast_started": "📣 Xabar yuborish boshlandi: {total} ta qabul qiluvchi.",
+        "broadcast_progress": "📣 Yuborilmoqda: {done}/{total}",
+        "counts_repaired": "Joylar hisoblagichlari qayta hisoblandi. Tuzatilgan tadbirlar: {count}",
+        "sheets_sync_queued": "Google Sheets bilan sinxronlash boshlandi. Tugagach hisobot yuboraman.",
+        "sheets_sync_running": "Google Sheets bilan sinxronlash allaqachon ketmoqda.",
+        "sheets_sync_failed": "Google Sheets bilan sinxronlash amalga oshmadi. Tafsilotlar bot loglarida.",
+        "sheets_sync_done": "Google Sheets bilan sinxronlash yakunlandi.\n\nTadbirlar: {events}\nQo'shilgan qatorlar: {added}\nO'chirilgan qatorlar: {removed}\nAPI so'rovlari: {calls}",
+        "sheets_not_configured": "Google Sheets sozlanmagan.",
+        "broadcast_done": "📣 Xabar yuborish yakunlandi.\n\n✅ Yetkazildi: {sent}\n🚫 Botni bloklagan: {blocked}\n❌ Xatolar: {failed}",
+        "spots": "👥 O'rinlar: {available}/{total}",
+        "spots_unlimited": "👥 O'rinlar: ∞",
+        "location_label": "📍 Joylashuv",
+        "no_spots": "❌ O'rinlar yo'q",
+        "slow_down": "Juda ko'p xabar yubordingiz, ulardan ba'zilari o'tkazib yuborildi. Bir necha soniya kuting va ularni qayta yuboring.",
+        "event_not_found": "Tadbir topilmadi",
+        "capacity_invalid": "Iltimos, son kiriting (0 yoki undan katta)",
+        "photo_required": "Iltimos, rasm yuboring.",
+        "cat_save_failed": "Kategoriyani saqlab bo'lmadi: xatolik yoki bunday kategoriya allaqachon bor.",
+        "use_buttons": "Iltimos, tugmalardan birini tanlang.",
+        "choose_language": "Please choose a language / Пожалуйста, выберите язык / Tilni tanlang:",
+        "choose_language_buttons": "Please use the buttons / Пожалуйста, используйте кнопки / Iltimos, tugmalardan foydalaning",
+        "moder_password": "Moderator parolini kiriting:",
+        "moder_no_events": "Mavjud tadbirlar yo'q",
+        "moder_online_events": "📱 Onlayn tadbirlar:",
+        "moder_offline_events": "📍 Offlayn tadbirlar:",
+        "checkin_prompt": "Telefon raqami yoki chipta kodini kiriting (bir nechtasini, har birini yangi qatordan):",
+        "checkin_counter": "Belgilandi: {attended} / {registered}",
+        "checkin_ok": "✅ {name} ({phone})",
+        "checkin_already": "☑️ {name} ({phone}) — allaqachon belgilangan",
+        "checkin_invalid_ticket": "⛔️ {code} — yaroqsiz chipta",
+        "checkin_wrong_event": "⛔️ {code} — boshqa tadbir chiptasi",
+        "checkin_not_found": "❌ {phone} — topilmadi",
+        "checkin_next": "Keyingi raqamni kiriting"
     },
     "en": {
         "welcome": "Welcome! Please choose a language:",
@@ -156,6 +224,7 @@ STRINGS = {
         "phone_changed": "Phone updated successfully!",
         "register": "Register ✅",
         "reg_success": "You have successfully registered for the event!",
+        "ticket_code": "🎟 Your ticket: {code}\nShow it to the moderator at the entrance.",
         "already_reg": "You are already registered for this event.",
         "confirm_reg": "Your registration details:\n\n👤 Name: {name}\n📞 Phone: {phone}\n\nIs the correct?",
         "confirm_btn": "Yes, register ✅",
@@ -177,6 +246,39 @@ STRINGS = {
         "edit_capacity": "Change Capacity",
         "edit_location": "Change Location",
         "event_updated": "Event updated!",
-        "enter_new_val": "Enter new value:"
+        "enter_new_val": "Enter new value:",
+        "broadcast_started": "📣 Broadcast started: {total} recipients.",
+        "broadcast_progress": "📣 Broadcasting: {done}/{total}",
+        "counts_repaired": "Seat counters recalculated. Events fixed: {count}",
+        "sheets_sync_queued": "Google Sheets sync started. I will send a report when it finishes.",
+        "sheets_sync_running": "A Google Sheets sync is already running.",
+        "sheets_sync_failed": "Google Sheets sync failed. See the bot logs for details.",
+        "sheets_sync_done": "Google Sheets sync finished.\n\nEvents: {events}\nRows added: {added}\nRows removed: {removed}\nAPI calls: {calls}",
+        "sheets_not_configured": "Google Sheets is not configured.",
+        "broadcast_done": "📣 Broadcast finished.\n\n✅ Delivered: {sent}\n🚫 Blocked the bot: {blocked}\n❌ Failed: {failed}",
+        "spots": "👥 Spots: {available}/{total}",
+        "spots_unlimited": "👥 Spots: ∞",
+        "location_label": "📍 Location",
+        "no_spots": "❌ No spots available",
+        "slow_down": "Too many messages at once, so some were skipped. Wait a few seconds and send them again.",
+        "event_not_found": "Event not found",
+        "capacity_invalid": "Please enter a number (0 or more)",
+        "photo_required": "Please send a photo.",
+        "cat_save_failed": "Could not save the category: an error, or it already exists.",
+        "use_buttons": "Please choose one of the buttons.",
+        "choose_language": "Please choose a language / Пожалуйста, выберите язык / Tilni tanlang:",
+        "choose_language_buttons": "Please use the buttons / Пожалуйста, используйте кнопки / Iltimos, tugmalardan foydalaning",
+        "moder_password": "Enter moderator password:",
+        "moder_no_events": "No events available",
+        "moder_online_events": "📱 Online Events:",
+        "moder_offline_events": "📍 Offline Events:",
+        "checkin_prompt": "Enter phone number or ticket code (several allowed, one per line):",
+        "checkin_counter": "Checked in: {attended} / {registered}",
+        "checkin_ok": "✅ {name} ({phone})",
+        "checkin_already": "☑️ {name} ({phone}) — already checked in",
+        "checkin_invalid_ticket": "⛔️ {code} — invalid ticket",
+        "checkin_wrong_event": "⛔️ {code} — ticket for another event",
+        "checkin_not_found": "❌ {phone} — not found",
+        "checkin_next": "Enter next number to check"
     }
 }
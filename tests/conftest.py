@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("SHEETS_BACKEND", "fake")
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """database.py on a fresh scratch file in a temporary directory"""
+    monkeypatch.chdir(tmp_path)
+    import database
+    database.close_db()
+    database.user_cache.clear()
+    database.init_db()
+    yield database
+    database.close_db()
+    database.user_cache.clear()
@@ -0,0 +1,68 @@
+"""
+confirm_registration always ends with the user holding a ticket, even
+when the confirmation message cannot be deleted or the first reply was
+lost.
+"""
+import asyncio
+import datetime
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import DeleteMessage, SendMessage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+USER_ID = 7
+
+class FakeSession(BaseSession):
+    """Records sent texts; deleting a message fails like one older than 48 hours"""
+
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, DeleteMessage):
+            raise TelegramBadRequest(method, "Bad Request: message can't be deleted")
+        if isinstance(method, SendMessage):
+            self.texts.append(method.text)
+            return Message(message_id=len(self.texts), date=datetime.datetime.now(),
+                           chat=Chat(id=method.chat_id, type="private"), text=method.text)
+        return True
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+def tap(update_id, event_id):
+    user = User(id=USER_ID, is_bot=False, first_name="User")
+    message = Message(message_id=1, date=datetime.datetime.now(), chat=Chat(id=USER_ID, type="private"),
+                      from_user=User(id=1, is_bot=True, first_name="bot"), text="confirm")
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), from_user=user, chat_instance="1", message=message, data=f"confirm_reg_{event_id}"))
+
+def test_ticket_survives_failed_delete_and_is_resent(db, monkeypatch):
+    import tickets
+    from main import create_dispatcher
+    monkeypatch.setattr(tickets, "qrcode", None)
+    db.add_category("Online")
+    db.add_event(1, None, "Event", "10:00", "2030-01-01", 10)
+    event_id = db.get_events_after(0, 1)[0][0]
+    db.add_user(USER_ID, "User", "+998901234567", "en")
+    code = tickets.issue(event_id, USER_ID)
+
+    session = FakeSession()
+    bot = Bot(token="123456:TEST", session=session)
+    dp = create_dispatcher(throttle=False)
+
+    async def run():
+        await dp.feed_update(bot, tap(1, event_id))
+        await dp.feed_update(bot, tap(2, event_id))
+
+    asyncio.run(run())
+
+    assert db.is_user_registered(USER_ID, event_id)
+    assert len(session.texts) == 2
+    assert all(code in text for text in session.texts)
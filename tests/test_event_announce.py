@@ -0,0 +1,28 @@
+"""
+A new event and its announcement job are written in one transaction.
+"""
+import pytest
+
+def counts(db):
+    with db.get_cursor() as cursor:
+        cursor.execute("SELECT (SELECT COUNT(*) FROM events), (SELECT COUNT(*) FROM broadcast_jobs)")
+        return cursor.fetchone()
+
+def test_event_and_job_are_created_together(db):
+    db.add_category("Online")
+    db.add_user(1, "User", "+998901234567", "ru")
+    event_id, job_id = db.add_event_with_broadcast("new_event_notify", 10, "ru", 1, None, "Event", "10:00", "2030-01-01", 5)
+    assert counts(db) == (1, 1)
+    assert db.get_event_by_id(event_id) is not None
+    assert db.get_next_broadcast_job()[:2] == (job_id, "new_event_notify")
+
+def test_failed_job_insert_rolls_back_the_event(db, monkeypatch):
+    db.add_category("Online")
+
+    def broken(*args):
+        raise RuntimeError("outbox unavailable")
+
+    monkeypatch.setattr(db, "_insert_broadcast_job", broken)
+    with pytest.raises(RuntimeError):
+        db.add_event_with_broadcast("new_event_notify", 10, "ru", 1, None, "Event", "10:00", "2030-01-01", 5)
+    assert counts(db) == (0, 0)
@@ -0,0 +1,102 @@
+"""
+Concurrency stress tests for reserve_seat: however the taps interleave,
+an event never takes more registrations than max_participants and a user
+never holds two seats.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+
+CAPACITY = 10
+
+def create_event(db, capacity=CAPACITY):
+    db.add_category("Online")
+    db.add_event(1, None, "Stress", "10:00", "2030-01-01", capacity)
+    return db.get_events_after(0, 1)[0][0]
+
+def seats(db, event_id):
+    """(registered_count column, actual registrations)"""
+    with db.get_cursor() as cursor:
+        cursor.execute("SELECT registered_count FROM events WHERE id = ?", (event_id,))
+        counted = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM registrations WHERE event_id = ?", (event_id,))
+        return counted, cursor.fetchone()[0]
+
+def test_concurrent_awaits_fill_exactly_capacity(db):
+    import async_database
+    event_id = create_event(db)
+
+    async def burst():
+        return await asyncio.gather(*(async_database.reserve_seat(user_id, event_id) for user_id in range(200)))
+
+    results = asyncio.run(burst())
+    assert results.count(db.SeatReservation.OK) == CAPACITY
+    assert results.count(db.SeatReservation.FULL) == 200 - CAPACITY
+    assert seats(db, event_id) == (CAPACITY, CAPACITY)
+
+def test_threads_never_oversell(db):
+    event_id = create_event(db)
+    results = []
+    start = threading.Barrier(20)
+
+    def tap(first_user):
+        start.wait()
+        for user_id in range(first_user, first_user + 10):
+            results.append(db.reserve_seat(user_id, event_id))
+
+    threads = [threading.Thread(target=tap, args=(n * 10,)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(db.SeatReservation.OK) == CAPACITY
+    assert seats(db, event_id) == (CAPACITY, CAPACITY)
+
+def test_repeated_taps_register_once(db):
+    import async_database
+    event_id = create_event(db)
+
+    async def double_taps():
+        return await asyncio.gather(*(async_database.reserve_seat(42, event_id) for _ in range(50)))
+
+    results = asyncio.run(double_taps())
+    assert results.count(db.SeatReservation.OK) == 1
+    assert results.count(db.SeatReservation.ALREADY_REGISTERED) == 49
+    assert seats(db, event_id) == (1, 1)
+
+def _reserve_from_process(directory, event_id, users, start, results):
+    # Each process opens its own connection to the shared file, like bot workers
+    os.chdir(directory)
+    import database
+    start.wait()
+    results.extend([database.reserve_seat(user_id, event_id).value for user_id in users])
+
+def test_processes_never_oversell(db, tmp_path):
+    event_id = create_event(db)
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        results = manager.list()
+        start = manager.Barrier(4)
+        processes = [context.Process(target=_reserve_from_process,
+                                     args=(str(tmp_path), event_id, range(n * 50, (n + 1) * 50), start, results))
+                     for n in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+        results = list(results)
+    assert all(process.exitcode == 0 for process in processes)
+    assert len(results) == 200
+    assert results.count(db.SeatReservation.OK.value) == CAPACITY
+    assert seats(db, event_id) == (CAPACITY, CAPACITY)
+
+def test_unlimited_event_takes_everyone(db):
+    import async_database
+    event_id = create_event(db, capacity=0)
+
+    async def burst():
+        return await asyncio.gather(*(async_database.reserve_seat(user_id, event_id) for user_id in range(100)))
+
+    assert asyncio.run(burst()).count(db.SeatReservation.OK) == 100
+    assert seats(db, event_id) == (100, 100)
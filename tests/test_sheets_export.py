@@ -0,0 +1,102 @@
+"""
+The Sheets export queue against the fake gspread backend (SHEETS_BACKEND=fake).
+"""
+import asyncio
+import logging
+
+import gspread
+import pytest
+import requests
+
+import fake_gspread
+
+@pytest.fixture
+def sheets(db, monkeypatch):
+    """A fresh fake Sheets session, with every append_rows call recorded as (title, rows)"""
+    import google_sheets
+    monkeypatch.setattr(google_sheets, "_session", None)
+    appends = []
+    append_rows = fake_gspread.Worksheet.append_rows
+
+    def recording_append_rows(worksheet, values, **kwargs):
+        appends.append((worksheet.title, [list(row) for row in values]))
+        return append_rows(worksheet, values, **kwargs)
+
+    monkeypatch.setattr(fake_gspread.Worksheet, "append_rows", recording_append_rows)
+    db.add_category("Online")
+    db.add_event(1, None, "First", "10:00", "2030-01-01", 0)
+    db.add_event(1, None, "Second", "10:00", "2030-01-01", 0)
+    return google_sheets.get_session(), appends
+
+def queued(db):
+    with db.get_cursor() as cursor:
+        cursor.execute("SELECT event_id, full_name FROM sheet_exports ORDER BY id")
+        return cursor.fetchall()
+
+def quota_error():
+    response = requests.Response()
+    response.status_code = 429
+    response._content = b'{"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}}'
+    return gspread.exceptions.APIError(response)
+
+def test_flush_writes_each_event_with_one_append(db, sheets):
+    import sheets_export
+    session, appends = sheets
+    for i in range(6):
+        db.enqueue_sheet_export(1 + i % 2, f"User {i}", f"+99890000000{i}")
+
+    asyncio.run(sheets_export.flush())
+
+    assert sorted(appends) == [
+        ("#1 First", [["User 0", "+998900000000"], ["User 2", "+998900000002"], ["User 4", "+998900000004"]]),
+        ("#2 Second", [["User 1", "+998900000001"], ["User 3", "+998900000003"], ["User 5", "+998900000005"]]),
+    ]
+    assert queued(db) == []
+
+def test_rows_stay_queued_until_their_append_succeeds(db, sheets, monkeypatch):
+    import google_sheets
+    import sheets_export
+    session, appends = sheets
+    db.enqueue_sheet_export(1, "Written", "+998900000001")
+    db.enqueue_sheet_export(2, "Failed", "+998900000002")
+    append_rows = google_sheets.SheetsSession.append_rows
+
+    def failing_for_event_2(self, event_id, description, rows):
+        if event_id == 2:
+            raise quota_error()
+        return append_rows(self, event_id, description, rows)
+
+    monkeypatch.setattr(google_sheets.SheetsSession, "append_rows", failing_for_event_2)
+    with pytest.raises(gspread.exceptions.APIError):
+        asyncio.run(sheets_export.flush())
+
+    assert [title for title, _ in appends] == ["#1 First"]
+    assert queued(db) == [(2, "Failed")]
+
+def test_quota_errors_back_off_and_keep_the_rows(db, sheets, monkeypatch, caplog):
+    import google_sheets
+    import sheets_export
+    db.enqueue_sheet_export(1, "User", "+998900000001")
+
+    def over_quota(self, event_id, description, rows):
+        raise quota_error()
+
+    monkeypatch.setattr(google_sheets.SheetsSession, "append_rows", over_quota)
+    monkeypatch.setattr(sheets_export, "FLUSH_INTERVAL", 0.01)
+    monkeypatch.setattr(sheets_export, "BASE_BACKOFF", 0.01)
+    monkeypatch.setattr(sheets_export, "MAX_BACKOFF", 0.04)
+
+    async def run():
+        # Fresh primitives: asyncio objects bind to the loop they are first awaited on
+        monkeypatch.setattr(sheets_export, "_flush_now", asyncio.Event())
+        monkeypatch.setattr(sheets_export, "lock", asyncio.Lock())
+        worker = asyncio.create_task(sheets_export.run_worker())
+        await asyncio.sleep(0.3)
+        worker.cancel()
+
+    with caplog.at_level(logging.WARNING, logger="sheets_export"):
+        asyncio.run(run())
+
+    backoffs = [record.args[0] for record in caplog.records if "quota" in record.getMessage()]
+    assert backoffs[:4] == [0.01, 0.02, 0.04, 0.04]
+    assert queued(db) == [(1, "User")]
@@ -0,0 +1,60 @@
+"""
+SheetsSession.reconcile against the fake gspread backend (SHEETS_BACKEND=fake).
+"""
+import pytest
+
+import fake_gspread
+import google_sheets
+
+@pytest.fixture
+def session():
+    return google_sheets.SheetsSession(fake_gspread.Client())
+
+def rows(count, start=0):
+    return [[f"User {i}", f"+998900{i:06d}"] for i in range(start, start + count)]
+
+def sheet_values(session, event_id):
+    return session.event_worksheet(event_id, "Event").values
+
+def test_reconcile_counts_added_and_removed_rows(session):
+    session.append_rows(1, "Event", rows(5))
+
+    assert session.reconcile(1, "Event", rows(5)) == (0, 0)
+    assert session.reconcile(1, "Event", rows(5) + rows(2, start=5)) == (2, 0)
+    assert session.reconcile(1, "Event", rows(3, start=1) + rows(1, start=10)) == (1, 4)
+    assert sheet_values(session, 1) == [google_sheets.HEADER] + rows(3, start=1) + rows(1, start=10)
+
+def test_reconcile_blanks_the_leftover_tail(session):
+    session.append_rows(1, "Event", rows(6))
+    worksheet = session.event_worksheet(1, "Event")
+    writes = []
+    update = worksheet.update
+
+    def recording_update(range_name, values, **kwargs):
+        writes.append((range_name, values))
+        return update(range_name, values, **kwargs)
+
+    worksheet.update = recording_update
+    assert session.reconcile(1, "Event", rows(2)) == (0, 4)
+
+    # One write from the first differing row: nothing differs, so only the blanked tail
+    assert writes == [("A4", [["", ""]] * 4)]
+    assert worksheet.values == [google_sheets.HEADER] + rows(2)
+
+def test_reconcile_sizes_the_grid_from_the_rows_it_read(session):
+    # Appends grow the grid past the row_count cached on the worksheet object
+    session.append_rows(1, "Event", rows(150))
+    worksheet = session.event_worksheet(1, "Event")
+    assert worksheet.row_count == 100 and worksheet.grid_rows == 151
+
+    changed = rows(150)
+    changed[0] = ["Renamed", changed[0][1]]
+    calls = worksheet._client.calls
+    assert session.reconcile(1, "Event", changed) == (1, 1)
+    # get_all_values and one update; no resize
+    assert worksheet._client.calls - calls == 2
+    assert worksheet.values == [google_sheets.HEADER] + changed
+
+    grown = changed + rows(20, start=150)
+    assert session.reconcile(1, "Event", grown) == (20, 0)
+    assert worksheet.values == [google_sheets.HEADER] + grown
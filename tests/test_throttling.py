@@ -0,0 +1,49 @@
+"""
+ThrottlingMiddleware: flooders are told to slow down instead of being
+dropped silently, and logged-in staff are not throttled at all.
+"""
+import asyncio
+from types import SimpleNamespace
+
+STAFF_STATE = "ModeratorState:check_phone"
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def answer(self, text):
+        self.replies.append(text)
+
+def flood(middleware, count, raw_state=None):
+    """Send `count` text messages from user 1; returns (handled, replies)"""
+    message = FakeMessage()
+    event = SimpleNamespace(callback_query=None, message=message)
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+
+    async def run():
+        for _ in range(count):
+            await middleware(handler, event, {"event_from_user": SimpleNamespace(id=1), "raw_state": raw_state})
+
+    asyncio.run(run())
+    return len(handled), message.replies
+
+def test_dropped_messages_get_one_slow_down_reply(db):
+    from i18n import t
+    from middlewares import ThrottlingMiddleware
+    db.add_user(1, "User", "+998901234567", "en")
+
+    handled, replies = flood(ThrottlingMiddleware(rate=0.001, burst=3), 10)
+    assert handled == 3
+    assert replies == [t("en", "slow_down")]
+
+def test_staff_states_are_not_throttled(db):
+    from middlewares import ThrottlingMiddleware
+    middleware = ThrottlingMiddleware(rate=0.001, burst=3, exempt_states={STAFF_STATE})
+
+    handled, replies = flood(middleware, 50, raw_state=STAFF_STATE)
+    assert handled == 50
+    assert replies == []
+    assert middleware.stats()["throttled"] == 0
@@ -0,0 +1,68 @@
+"""
+Signed ticket codes.
+
+A ticket is "<event_id>-<user_id>-<signature>", where the signature is a
+truncated HMAC-SHA256 of the ids under TICKET_SECRET. A moderator pastes
+(or scans) the code and it is verified without touching the database, so
+check-in is a single indexed update on the registration. Without
+TICKET_SECRET the key is derived from BOT_TOKEN; changing either
+invalidates tickets already issued.
+
+QR images are generated locally when the optional `qrcode` package (with
+Pillow) is installed; otherwise only the text code is sent.
+"""
+import base64
+import hashlib
+import hmac
+import io
+import logging
+import re
+
+try:
+    import PIL  # noqa: F401  qrcode falls back to its pure-Python PNG writer without it
+    import qrcode
+except ImportError:
+    qrcode = None
+
+from config import BOT_TOKEN, TICKET_SECRET
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_LENGTH = 10  # base32 characters, 50 bits
+TICKET_RE = re.compile(r"^(\d+)-(\d+)-([A-Z2-7]{%d})$" % SIGNATURE_LENGTH)
+
+_key = (TICKET_SECRET or hashlib.sha256(f"avlod-tickets:{BOT_TOKEN}".encode()).hexdigest()).encode()
+
+def _signature(event_id, user_id):
+    digest = hmac.new(_key, f"{event_id}:{user_id}".encode(), hashlib.sha256).digest()
+    return base64.b32encode(digest).decode()[:SIGNATURE_LENGTH]
+
+def issue(event_id, user_id):
+    return f"{event_id}-{user_id}-{_signature(event_id, user_id)}"
+
+def is_ticket_code(text):
+    """True if the text has the shape of a ticket (signature not checked)"""
+    return TICKET_RE.match(text.strip().upper()) is not None
+
+def verify(code):
+    """(event_id, user_id) for a genuine ticket code, otherwise None"""
+    match = TICKET_RE.match(code.strip().upper())
+    if not match:
+        return None
+    event_id, user_id = int(match[1]), int(match[2])
+    if not hmac.compare_digest(match[3], _signature(event_id, user_id)):
+        return None
+    return event_id, user_id
+
+def qr_png(code):
+    """PNG bytes of a QR code holding the ticket, or None if it cannot be drawn"""
+    if qrcode is None:
+        return None
+    buffer = io.BytesIO()
+    try:
+        # No format argument: every qrcode image factory writes PNG by default
+        qrcode.make(code).save(buffer)
+    except Exception:
+        logger.exception("Drawing the QR code for ticket %s failed", code)
+        return None
+    return buffer.getvalue()
@@ -0,0 +1,80 @@
+"""
+Webhook runtime, the alternative to long polling (BOT_MODE=webhook).
+
+Telegram POSTs every update to WEBHOOK_URL + WEBHOOK_PATH and an aiohttp
+server feeds it to the dispatcher. WEBHOOK_SECRET is required, and
+SimpleRequestHandler rejects requests whose secret-token header does not
+match it. Each update is
+handled before the response is sent, so Telegram's per-connection
+delivery keeps the order of one chat's updates and
+WEBHOOK_MAX_CONNECTIONS bounds concurrency. GET /health answers for load
+balancers and uptime checks.
+
+On SIGINT/SIGTERM the server stops accepting connections and waits for
+in-flight updates before returning. The webhook itself stays registered,
+so Telegram holds new updates until the next start.
+"""
+import asyncio
+import logging
+import signal
+
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import (WEBHOOK_HOST, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_PATH,
+                    WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL)
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_TIMEOUT = 30  # seconds to finish in-flight updates
+
+async def health(request):
+    return web.json_response({"status": "ok"})
+
+def create_app(dp, bot, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET):
+    if not secret:
+        raise ValueError("The webhook needs a secret token (WEBHOOK_SECRET)")
+    app = web.Application()
+    app.router.add_get("/health", health)
+    handler = SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret, handle_in_background=False)
+    handler.register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+def stop_on_signals():
+    """Event that is set on SIGINT/SIGTERM"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+    return stop
+
+async def serve(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, stop=None):
+    """Run the app until `stop` is set (by default on SIGINT/SIGTERM)"""
+    if stop is None:
+        stop = stop_on_signals()
+
+    runner = web.AppRunner(app, shutdown_timeout=SHUTDOWN_TIMEOUT)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Webhook server listening on %s:%s", host, port)
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Webhook server shutting down")
+        await runner.cleanup()
+
+async def register(bot, allowed_updates):
+    await bot.set_webhook(
+        WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=allowed_updates,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+    )
+
+async def run(dp, bot):
+    await register(bot, dp.resolve_used_update_types())
+    await serve(create_app(dp, bot))